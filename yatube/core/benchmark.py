@@ -0,0 +1,326 @@
+"""Нагрузочный прогон сайта на сгенерированных данных.
+
+Данные создаются mixer и Faker в тестовой БД, подписки распределены
+по степенному закону: у немногих авторов большинство подписчиков.
+Каждый маршрут ``posts.urls``, ``users.urls`` и ``about.urls``
+вызывается через тестовый клиент; по маршрутам считаются перцентили
+задержки и число запросов к БД. Результат сравнивается с сохранённым
+базовым JSON.
+
+``concurrency`` отдельно меряет пропускную способность SQLite при
+одновременных записях и чтениях на копии основной БД.
+"""
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLResolver, get_resolver
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from faker import Faker
+from mixer.backend.django import mixer
+from PIL import Image
+
+from core.db import copy_sqlite
+from core.queries import QueryRecorder
+from posts import counters, images
+from posts.models import Comment, Follow, Group, Post, User
+
+# Показатель степенного закона для популярности авторов.
+FOLLOW_EXPONENT = 1.2
+BULK_BATCH = 500
+APP_NAMESPACES = ('posts', 'users', 'about')
+PERCENTILES = (50, 95, 99)
+# Допустимый рост p95 относительно базового прогона и запас в мс
+# на шум быстрых страниц.
+LATENCY_TOLERANCE = 0.25
+LATENCY_SLACK_MS = 2
+CONCURRENCY_ALIAS = 'concurrency_benchmark'
+# Настройки SQLite до перехода на WAL: журнал отката и новое
+# соединение на каждый запрос.
+SQLITE_BASELINE = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+
+def _zipf_weights(count, exponent=FOLLOW_EXPONENT):
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def _image_file(name, fake):
+    image = Image.new('RGB', (1600, 1200), fake.hex_color())
+    content = BytesIO()
+    image.save(content, 'JPEG')
+    return SimpleUploadedFile(name, content.getvalue(), 'image/jpeg')
+
+
+def generate_dataset(users, posts, comments, follows, images_count,
+                     groups=10, seed=0):
+    """Создаёт пользователей, группы, посты, комментарии и подписки."""
+    rng = random.Random(seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    # Поля, которые mixer заполняет сам, тоже зависят только от seed.
+    mixer.faker.seed_instance(seed)
+    users = mixer.cycle(users).blend(
+        User, username=mixer.sequence('user_{0}')
+    )
+    groups = mixer.cycle(groups).blend(
+        Group, slug=mixer.sequence('group_{0}')
+    )
+    # Пишут и собирают подписчиков в основном одни и те же авторы.
+    authors = users[:]
+    rng.shuffle(authors)
+    weights = _zipf_weights(len(authors))
+    new_posts = [
+        Post(
+            author=rng.choices(authors, weights)[0],
+            group=rng.choice(groups + [None]),
+            text=fake.text(max_nb_chars=rng.randint(50, 1000)),
+        )
+        for _ in range(posts)
+    ]
+    Post.objects.bulk_create(new_posts, batch_size=BULK_BATCH)
+    post_ids = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+    Comment.objects.bulk_create([
+        Comment(
+            post_id=rng.choice(post_ids),
+            author=rng.choice(users),
+            text=fake.sentence(),
+        )
+        for _ in range(comments)
+    ], batch_size=BULK_BATCH)
+    pairs = set()
+    for _ in range(follows * 10):
+        if len(pairs) >= follows:
+            break
+        user = rng.choice(users)
+        author = rng.choices(authors, weights)[0]
+        if user != author:
+            pairs.add((user.pk, author.pk))
+    # Подписки через ORM: сигналы заполняют ленты подписчиков.
+    for user_id, author_id in sorted(pairs):
+        Follow.objects.create(user_id=user_id, author_id=author_id)
+    image_ids = rng.sample(post_ids, min(images_count, len(post_ids)))
+    for post in Post.objects.filter(pk__in=image_ids).order_by('pk'):
+        upload = images.ingest_image(_image_file(f'{post.pk}.jpg', fake))
+        post.image.save(upload.name, upload)
+    counters.recount_groups()
+    counters.recount_posts()
+    counters.recount_users()
+    return users
+
+
+def _route_kwargs(user, post, group):
+    return {
+        'slug': group.slug,
+        'username': post.author.username,
+        'post_id': post.pk,
+        'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+        'token': default_token_generator.make_token(user),
+    }
+
+
+def routes(user, post, group):
+    """[(имя, url)] для всех маршрутов приложений сайта."""
+    values = _route_kwargs(user, post, group)
+    found = []
+    for resolver in get_resolver().url_patterns:
+        if not isinstance(resolver, URLResolver):
+            continue
+        if resolver.namespace not in APP_NAMESPACES:
+            continue
+        prefix = str(resolver.pattern)
+        for pattern in resolver.url_patterns:
+            route = prefix + str(pattern.pattern)
+            for name, value in values.items():
+                route = route.replace(f'<{name}>', str(value))
+                for converter in ('slug', 'str', 'int'):
+                    route = route.replace(
+                        f'<{converter}:{name}>', str(value)
+                    )
+            found.append((f'{resolver.namespace}:{pattern.name}', route))
+    return found
+
+
+def percentile(values, rank):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(0, -(-len(ordered) * rank // 100) - 1)
+    return ordered[index]
+
+
+def run(user, urls, requests, warmup=1):
+    """Прогоняет маршруты и возвращает статистику по каждому.
+
+    QueryBudgetMiddleware на время замеров выключен: он разбирает стек
+    на каждый запрос к БД и завышает задержки.
+    """
+    with override_settings(QUERY_BUDGET_ENABLED=False):
+        return _run(user, urls, requests, warmup)
+
+
+def _run(user, urls, requests, warmup):
+    client = Client()
+    results = {}
+    started = time.perf_counter()
+    total = 0
+    for name, url in urls:
+        latencies, queries = [], []
+        for attempt in range(warmup + requests):
+            # Выход из учётной записи тоже маршрут: входим снова.
+            if '_auth_user_id' not in client.session:
+                client.force_login(user)
+            with QueryRecorder(locate=False) as recorder:
+                request_started = time.perf_counter()
+                client.get('/' + url)
+                latency = time.perf_counter() - request_started
+            if attempt >= warmup:
+                latencies.append(latency * 1000)
+                queries.append(recorder.count)
+        total += requests
+        results[name] = {
+            **{
+                f'p{rank}': round(percentile(latencies, rank), 3)
+                for rank in PERCENTILES
+            },
+            'queries': max(queries),
+        }
+    elapsed = time.perf_counter() - started
+    return {'routes': results, 'throughput': round(total / elapsed, 1)}
+
+
+def compare(result, baseline, tolerance=LATENCY_TOLERANCE):
+    """Регрессии относительно базового прогона: список строк."""
+    regressions = []
+    for name, stats in result['routes'].items():
+        base = baseline['routes'].get(name)
+        if base is None:
+            continue
+        if stats['p95'] > base['p95'] * (1 + tolerance) + LATENCY_SLACK_MS:
+            regressions.append(
+                f'{name}: p95 {stats["p95"]} мс, было {base["p95"]} мс'
+            )
+        if stats['queries'] > base['queries']:
+            regressions.append(
+                f'{name}: {stats["queries"]} запросов, '
+                f'было {base["queries"]}'
+            )
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_baseline(path, result):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(result, file, ensure_ascii=False, indent=2)
+
+
+def _write(alias, post_id, author_id):
+    # Как add_comment: комментарий и счётчик поста в одной транзакции.
+    with transaction.atomic(using=alias):
+        Comment.objects.using(alias).bulk_create([Comment(
+            post_id=post_id, author_id=author_id, text='Нагрузка'
+        )])
+        Post.objects.using(alias).filter(pk=post_id).update(
+            comments_count=F('comments_count') + 1
+        )
+
+
+def _read(alias, post_id, author_id):
+    # Как первая страница главной ленты.
+    list(Post.objects.using(alias).select_related('author', 'group')[:10])
+
+
+def _worker(operation, args, deadline, persistent, counts, kind, lock):
+    done = errors = 0
+    while time.perf_counter() < deadline:
+        try:
+            operation(CONCURRENCY_ALIAS, *args)
+            done += 1
+        except OperationalError:
+            # database is locked
+            errors += 1
+        if not persistent:
+            connections[CONCURRENCY_ALIAS].close()
+    connections[CONCURRENCY_ALIAS].close()
+    with lock:
+        counts[kind] += done
+        counts['errors'] += errors
+
+
+def concurrency(writers, readers, duration, pragmas, persistent):
+    """Записи и чтения в секунду на копии основной SQLite-базы.
+
+    ``pragmas`` ставятся каждому соединению, ``persistent=False``
+    открывает новое соединение на каждую операцию.
+    """
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'benchmark.sqlite3')
+    copy_sqlite(path)
+    connections.databases[CONCURRENCY_ALIAS] = {
+        'ENGINE': 'django.db.backends.sqlite3', 'NAME': path,
+    }
+    counts = {'writes': 0, 'reads': 0, 'errors': 0}
+    try:
+        with override_settings(SQLITE_PRAGMAS=pragmas):
+            author = User.objects.using(CONCURRENCY_ALIAS).first()
+            if author is None:
+                author = User(username='benchmark')
+                User.objects.using(CONCURRENCY_ALIAS).bulk_create([author])
+                author = User.objects.using(CONCURRENCY_ALIAS).get()
+            post = Post.objects.using(CONCURRENCY_ALIAS).first()
+            if post is None:
+                Post.objects.using(CONCURRENCY_ALIAS).bulk_create(
+                    [Post(author_id=author.pk, text='Нагрузка')]
+                )
+                post = Post.objects.using(CONCURRENCY_ALIAS).get()
+            connections[CONCURRENCY_ALIAS].close()
+            lock = threading.Lock()
+            deadline = time.perf_counter() + duration
+            threads = [
+                threading.Thread(target=_worker, args=(
+                    operation, (post.pk, author.pk), deadline, persistent,
+                    counts, kind, lock,
+                ))
+                for operation, kind, count in (
+                    (_write, 'writes', writers), (_read, 'reads', readers)
+                )
+                for _ in range(count)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    finally:
+        connections[CONCURRENCY_ALIAS].close()
+        del connections[CONCURRENCY_ALIAS]
+        del connections.databases[CONCURRENCY_ALIAS]
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+    return {
+        'writes': round(counts['writes'] / duration, 1),
+        'reads': round(counts['reads'] / duration, 1),
+        'errors': counts['errors'],
+    }
+
+
+def sqlite_profiles():
+    """{профиль: (pragmas, постоянные соединения)} для сравнения."""
+    return {
+        'было': (SQLITE_BASELINE, False),
+        'сейчас': (settings.SQLITE_PRAGMAS, True),
+    }
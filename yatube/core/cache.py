@@ -0,0 +1,316 @@
+"""Двухуровневый кеш для нескольких процессов.
+
+L1 - маленький кеш в памяти процесса, L2 - общий кеш в файлах на
+локальном диске. Ключи, изменённые в L2, попадают в журнал инвалидаций
+(SQLite-файл рядом с кешем): они копятся за запрос и пишутся одной
+транзакцией в ``close()``, который Django вызывает в конце запроса.
+В начале каждого запроса процесс читает новые строки журнала
+и выбрасывает из своего L1 изменённые ключи, поэтому воркеры
+не отдают устаревшие данные друг друга.
+
+Подключается вместо любого бэкенда в ``CACHES``::
+
+    'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': '/var/tmp/yatube_cache',
+        'OPTIONS': {'L1_MAX_ENTRIES': 1000, 'L1_TIMEOUT': 30},
+    }
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import request_started
+
+LOG_NAME = 'invalidations.sqlite3'
+# Сколько строк журнала хранить: отставший процесс очищает L1 целиком.
+LOG_KEEP = 10000
+LOG_PRUNE_EVERY = 1000
+# Сколько ключей и секунд копить до записи в журнал вне конца запроса.
+LOG_FLUSH_KEYS = 100
+LOG_FLUSH_DELAY = 1
+# Раз в сколько записей L2 пересчитывает файлы для вытеснения.
+CULL_CHECK_EVERY = 100
+
+_missing = object()
+
+
+def _raw_key(key, key_prefix, version):
+    return key
+
+
+class InvalidationLog:
+    """Журнал изменённых ключей в общем SQLite-файле."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        # После fork соединение родителя использовать нельзя.
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS invalidations ('
+                'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'origin TEXT NOT NULL, '
+                'key TEXT)'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def last_seq(self):
+        row = self.connection.execute(
+            'SELECT max(seq) FROM invalidations'
+        ).fetchone()
+        return row[0] or 0
+
+    def write(self, origin, keys):
+        """Записывает ключи; ``None`` означает очистку всего кеша."""
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT INTO invalidations (origin, key) VALUES (?, ?)',
+                [(origin, key) for key in keys],
+            )
+            seq = connection.execute(
+                'SELECT last_insert_rowid()'
+            ).fetchone()[0]
+            if seq % LOG_PRUNE_EVERY < len(keys):
+                connection.execute(
+                    'DELETE FROM invalidations WHERE seq <= ?',
+                    (seq - LOG_KEEP,),
+                )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def read(self, origin, after):
+        """Ключи, изменённые другими процессами после ``after``.
+
+        Возвращает (последний seq, ключи) или (seq, None), если
+        журнал уже обрезан и нужно очистить L1 целиком.
+        """
+        rows = self.connection.execute(
+            'SELECT seq, origin, key FROM invalidations '
+            'WHERE seq > ? ORDER BY seq',
+            (after,),
+        ).fetchall()
+        if not rows:
+            return after, []
+        if rows[0][0] > after + 1 and after:
+            lost = self.connection.execute(
+                'SELECT count(*) FROM invalidations WHERE seq <= ?',
+                (after,),
+            ).fetchone()[0] == 0
+            if lost:
+                return rows[-1][0], None
+        keys = [key for _, key_origin, key in rows if key_origin != origin]
+        if any(key is None for key in keys):
+            return rows[-1][0], None
+        return rows[-1][0], keys
+
+
+class FileCache(FileBasedCache):
+    """FileBasedCache, который не обходит каталог на каждой записи.
+
+    Число файлов для вытеснения считается раз в ``CULL_CHECK_EVERY``
+    записей, поэтому кеш может ненадолго превысить ``MAX_ENTRIES``.
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._sets = 0
+
+    def _cull(self):
+        self._sets += 1
+        if self._sets >= CULL_CHECK_EVERY:
+            self._sets = 0
+            super()._cull()
+
+
+class TieredCache(BaseCache):
+    """Кеш в памяти процесса (L1) перед общим файловым кешем (L2)."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l1_timeout = int(options.get('L1_TIMEOUT', 30))
+        self._l1 = LocMemCache(f'tiered:{location}', {
+            'TIMEOUT': self._l1_timeout,
+            'KEY_FUNCTION': _raw_key,
+            'OPTIONS': {
+                'MAX_ENTRIES': options.get('L1_MAX_ENTRIES', 1000),
+            },
+        })
+        self._l2 = FileCache(location, {
+            'TIMEOUT': params.get('TIMEOUT', 300),
+            'KEY_FUNCTION': _raw_key,
+            'OPTIONS': {
+                'MAX_ENTRIES': options.get('MAX_ENTRIES', 300),
+                'CULL_FREQUENCY': options.get('CULL_FREQUENCY', 3),
+            },
+        })
+        self._log = InvalidationLog(os.path.join(location, LOG_NAME))
+        self._origin = None
+        self._pid = None
+        self._seen = None
+        self._synced_at = 0
+        self._sync_lock = threading.Lock()
+        # Изменённые ключи, ещё не записанные в журнал.
+        self._pending = set()
+        self._pending_since = 0
+        # Экземпляры кеша создаются на каждый поток, а L1 общий
+        # для процесса, поэтому «своими» считаются записи процесса.
+        request_started.connect(self._on_request)
+
+    def _on_request(self, **kwargs):
+        self.sync()
+
+    def sync(self):
+        """Выбрасывает из L1 ключи, изменённые другими процессами."""
+        with self._sync_lock:
+            if self._pid != os.getpid():
+                # Новый процесс (в том числе после fork) начинает
+                # с пустым L1 и с текущего конца журнала.
+                self._pid = os.getpid()
+                self._origin = str(self._pid)
+                self._l1.clear()
+                self._seen = self._log.last_seq()
+            else:
+                self._seen, keys = self._log.read(self._origin, self._seen)
+                if keys is None:
+                    self._l1.clear()
+                else:
+                    for key in keys:
+                        self._l1.delete(key)
+            self._synced_at = time.monotonic()
+
+    def _maybe_sync(self):
+        # Вне запросов (команды, фоновые задачи) L1 сверяется с журналом
+        # не реже, чем живут его записи.
+        if time.monotonic() - self._synced_at > self._l1_timeout:
+            self.sync()
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _l1_timeout_for(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self._l1_timeout
+        return min(timeout, self._l1_timeout)
+
+    def _changed(self, *keys):
+        if self._pid != os.getpid():
+            self.sync()
+        if not self._pending:
+            self._pending_since = time.monotonic()
+        self._pending.update(keys)
+        # Вне запросов (команды, фоновые задачи) close() может
+        # не вызываться: журнал дописывается по размеру и по времени.
+        if (
+            None in self._pending
+            or len(self._pending) >= LOG_FLUSH_KEYS
+            or time.monotonic() - self._pending_since > LOG_FLUSH_DELAY
+        ):
+            self.flush()
+
+    def flush(self):
+        """Пишет накопленные ключи в журнал одной транзакцией."""
+        if not self._pending:
+            return
+        keys = [None] if None in self._pending else sorted(self._pending)
+        self._pending = set()
+        self._log.write(self._origin, keys)
+
+    def close(self, **kwargs):
+        self.flush()
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        self._maybe_sync()
+        value = self._l1.get(key, _missing)
+        if value is not _missing:
+            return value
+        value = self._l2.get(key, _missing)
+        if value is _missing:
+            return default
+        self._l1.set(key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        for key in keys:
+            value = self.get(key, _missing, version=version)
+            if value is not _missing:
+                found[key] = value
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._l2.set(key, value, timeout)
+        self._changed(key)
+        self._l1.set(key, value, self._l1_timeout_for(timeout))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        keys = []
+        for key, value in data.items():
+            key = self._key(key, version)
+            self._l2.set(key, value, timeout)
+            keys.append(key)
+        if keys:
+            self._changed(*keys)
+        for key, value in zip(keys, data.values()):
+            self._l1.set(key, value, self._l1_timeout_for(timeout))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        if not self._l2.add(key, value, timeout):
+            return False
+        self._changed(key)
+        self._l1.set(key, value, self._l1_timeout_for(timeout))
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._l1.touch(key, self._l1_timeout_for(timeout))
+        return self._l2.touch(key, timeout)
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        self._l2.delete(key)
+        self._changed(key)
+        self._l1.delete(key)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        for key in keys:
+            self._l2.delete(key)
+            self._l1.delete(key)
+        if keys:
+            self._changed(*keys)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version=version) is not _missing
+
+    def clear(self):
+        self._l2.clear()
+        self._changed(None)
+        self._l1.clear()
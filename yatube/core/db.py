@@ -0,0 +1,195 @@
+"""Чтение с реплик БД и запись в основную.
+
+``ReplicaMiddleware`` один раз за запрос выбирает, откуда читать:
+GET и HEAD к view из ``REPLICA_NAMESPACES`` идут на одну из реплик
+``REPLICA_DATABASES``, всё остальное и любой код вне запросов
+(команды, фоновые задачи) - на основную БД. ``ReplicaRouter`` только
+возвращает сделанный выбор.
+
+Запись всегда идёт в основную БД и до конца запроса переключает на неё
+чтение. Записавшему пользователю ставится cookie со временем записи:
+он читает только с реплик, снятых после неё, а пока таких нет - с
+основной БД, поэтому свои изменения видит сразу. Через
+``REPLICA_MAX_LAG`` секунд любая допустимая реплика новее записи,
+и cookie истекает.
+
+Реплика, на которой запрос упал с ошибкой БД, выводится из оборота на
+``REPLICA_RETRY_SECONDS``, а запрос повторяется на основной БД.
+Отставание определяется по отметке, которую оставляет синхронизация
+реплики (``sync_replica``): время начала копии. Реплика без отметки
+или старше ``REPLICA_MAX_LAG`` секунд не используется.
+
+``configure_sqlite`` настраивает каждое новое соединение с SQLite
+по ``SQLITE_PRAGMAS``.
+"""
+import logging
+import random
+import sqlite3
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+WROTE_COOKIE = 'wrote_at'
+HEARTBEAT_KEY = 'replica:heartbeat:{}'
+SAFE_METHODS = ('GET', 'HEAD')
+
+# Выбор БД текущего запроса: {'alias': ..., 'wrote': ...} или None.
+_state = ContextVar('replica_state', default=None)
+# Реплики, выведенные из оборота: {alias: до какого времени}.
+_down = {}
+
+
+def replicas():
+    return list(getattr(settings, 'REPLICA_DATABASES', []))
+
+
+def mark_down(alias):
+    _down[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+    logger.warning('Реплика %s недоступна, читаем с основной БД', alias)
+
+
+def _lagging(alias, wrote_at=None):
+    # Нет отметки - реплику не синхронизировали или отметка вытеснена
+    # из кеша: свежесть неизвестна.
+    synced = cache.get(HEARTBEAT_KEY.format(alias))
+    if synced is None:
+        return True
+    if wrote_at is not None and synced <= wrote_at:
+        # Копия снята до записи пользователя.
+        return True
+    return time.time() - synced > settings.REPLICA_MAX_LAG
+
+
+def available_replicas(wrote_at=None):
+    """Реплики, которые сейчас можно читать.
+
+    ``wrote_at`` - время последней записи пользователя: реплики,
+    снятые раньше, её ещё не содержат.
+    """
+    now = time.monotonic()
+    return [
+        alias for alias in replicas()
+        if _down.get(alias, 0) <= now and not _lagging(alias, wrote_at)
+    ]
+
+
+def _wrote_at(request):
+    try:
+        return float(request.COOKIES[WROTE_COOKIE])
+    except (KeyError, ValueError):
+        return None
+
+
+def read_alias(request):
+    """БД, с которой запрос читает данные."""
+    if request.method not in SAFE_METHODS:
+        return DEFAULT_DB_ALIAS
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return DEFAULT_DB_ALIAS
+    if (
+        match.namespace not in settings.REPLICA_NAMESPACES
+        or match.view_name in settings.REPLICA_PRIMARY_VIEWS
+    ):
+        return DEFAULT_DB_ALIAS
+    candidates = available_replicas(_wrote_at(request))
+    return random.choice(candidates) if candidates else DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        return state['alias'] if state else None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state:
+            state['alias'] = DEFAULT_DB_ALIAS
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной БД.
+        aliases = {DEFAULT_DB_ALIAS, *replicas()}
+        if {obj1._state.db, obj2._state.db} <= aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема попадает на реплики вместе с данными.
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Выбирает БД для чтения и ставит cookie после записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = {'alias': read_alias(request), 'wrote': False}
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state['wrote']:
+            # Запись уже зафиксирована: ответ строится после транзакции.
+            response.set_cookie(
+                WROTE_COOKIE,
+                repr(time.time()),
+                max_age=settings.REPLICA_MAX_LAG,
+                httponly=True,
+            )
+        return response
+
+    def process_exception(self, request, exception):
+        state = _state.get()
+        if (
+            not isinstance(exception, DatabaseError)
+            or state is None
+            or state['alias'] == DEFAULT_DB_ALIAS
+        ):
+            return None
+        mark_down(state['alias'])
+        state['alias'] = DEFAULT_DB_ALIAS
+        match = request.resolver_match
+        return match.func(request, *match.args, **match.kwargs)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Ставит ``SQLITE_PRAGMAS`` каждому новому соединению с SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    # Напрямую через sqlite3: эти запросы не попадают в учёт запросов.
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def copy_sqlite(path, using=DEFAULT_DB_ALIAS):
+    """Копирует SQLite-базу ``using`` в файл ``path`` целиком."""
+    source = connections[using]
+    source.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
+
+
+def sync_replica(alias):
+    """Обновляет SQLite-реплику копией основной БД."""
+    # Отметка - начало копии: всё записанное раньше в неё попало.
+    started = time.time()
+    copy_sqlite(settings.DATABASES[alias]['NAME'])
+    connections[alias].close()
+    cache.set(HEARTBEAT_KEY.format(alias), started, None)
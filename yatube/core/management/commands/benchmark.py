@@ -0,0 +1,113 @@
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from core import benchmark
+from posts.models import Group, Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет тестовую БД данными, прогоняет все страницы сайта '
+        'и сравнивает задержки с базовым прогоном.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=2000)
+        parser.add_argument('--images', type=int, default=20)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument(
+            '--requests', type=int, default=20,
+            help='Сколько раз вызывать каждый маршрут.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--baseline', help='JSON с результатами базового прогона.'
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результат в --baseline вместо сравнения.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=benchmark.LATENCY_TOLERANCE,
+            help='Допустимый рост p95, доля от базового значения.'
+        )
+
+    def handle(self, *args, **options):
+        if options['save_baseline'] and not options['baseline']:
+            raise CommandError('Для --save-baseline нужен --baseline')
+        runner = DiscoverRunner(verbosity=0)
+        runner.setup_test_environment()
+        databases = runner.setup_databases()
+        media = tempfile.mkdtemp()
+        cache = tempfile.mkdtemp()
+        try:
+            # Кеш и медиа отдельные: данные прогона не попадут на сайт.
+            with override_settings(
+                MEDIA_ROOT=media,
+                TASKS_ASYNC=False,
+                CACHES={'default': {
+                    'BACKEND': 'core.cache.TieredCache',
+                    'LOCATION': cache,
+                }},
+            ):
+                result = self.benchmark(options)
+        finally:
+            runner.teardown_databases(databases)
+            runner.teardown_test_environment()
+            shutil.rmtree(media, ignore_errors=True)
+            shutil.rmtree(cache, ignore_errors=True)
+        self.report(result)
+        self.check_baseline(result, options)
+
+    def benchmark(self, options):
+        users = benchmark.generate_dataset(
+            users=options['users'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            images_count=options['images'],
+            groups=options['groups'],
+            seed=options['seed'],
+        )
+        # Смотрим ленту самого активного подписчика и самый популярный пост.
+        user = max(users, key=lambda user: user.following.count())
+        post = Post.objects.order_by('-comments_count').first()
+        group = Group.objects.order_by('-posts_count').first()
+        urls = benchmark.routes(user, post, group)
+        return benchmark.run(user, urls, options['requests'])
+
+    def report(self, result):
+        self.stdout.write(
+            f'{"маршрут":40} {"p50":>8} {"p95":>8} {"p99":>8} {"SQL":>5}'
+        )
+        for name, stats in result['routes'].items():
+            self.stdout.write(
+                f'{name:40} {stats["p50"]:8.2f} {stats["p95"]:8.2f} '
+                f'{stats["p99"]:8.2f} {stats["queries"]:5}'
+            )
+        self.stdout.write(f'Запросов в секунду: {result["throughput"]}')
+
+    def check_baseline(self, result, options):
+        path = options['baseline']
+        if not path:
+            return
+        if options['save_baseline']:
+            benchmark.save_baseline(path, result)
+            self.stdout.write(f'Базовый прогон записан в {path}')
+            return
+        regressions = benchmark.compare(
+            result, benchmark.load_baseline(path), options['tolerance']
+        )
+        if regressions:
+            raise CommandError(
+                'Замедление относительно базового прогона:\n'
+                + '\n'.join(regressions)
+            )
+        self.stdout.write('Регрессий нет')
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite при одновременных '
+        'записях и чтениях: прежние настройки и SQLITE_PRAGMAS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument(
+            '--duration', type=float, default=5,
+            help='Сколько секунд длится прогон каждого профиля.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Основная БД - не SQLite')
+        if 'posts_post' not in connection.introspection.table_names():
+            raise CommandError('Сначала выполните migrate')
+        self.stdout.write(
+            f'{"профиль":10} {"записей/с":>10} {"чтений/с":>10} '
+            f'{"ошибок":>7}'
+        )
+        for name, (pragmas, persistent) in (
+            benchmark.sqlite_profiles().items()
+        ):
+            result = benchmark.concurrency(
+                options['writers'], options['readers'],
+                options['duration'], pragmas, persistent,
+            )
+            self.stdout.write(
+                f'{name:10} {result["writes"]:10} {result["reads"]:10} '
+                f'{result["errors"]:7}'
+            )
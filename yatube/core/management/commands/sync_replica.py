@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import db
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную SQLite-базу в файлы реплик. Запускается '
+        'периодически, пока вместо реплики используется копия.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help='Реплики из DATABASES, по умолчанию все.'
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or db.replicas()
+        if not aliases:
+            raise CommandError(
+                'Реплики не настроены: задайте YATUBE_REPLICA'
+            )
+        for alias in aliases:
+            engine = settings.DATABASES.get(alias, {}).get('ENGINE', '')
+            if not engine.endswith('sqlite3'):
+                raise CommandError(f'{alias}: не SQLite-реплика')
+            db.sync_replica(alias)
+            self.stdout.write(f'{alias}: синхронизирована')
@@ -0,0 +1,161 @@
+"""Раздача загруженных файлов: картинок постов и миниатюр.
+
+Отдаются только файлы из ``posts/`` и каталога миниатюр sorl внутри
+``MEDIA_ROOT``. Ответ несёт ETag и Last-Modified, на совпадающие
+If-None-Match и If-Modified-Since уходит 304. Заголовок Range с одним
+диапазоном байт даёт 206 (с учётом If-Range), недостижимый диапазон -
+416. Целый файл отдаётся ``FileResponse``: под WSGI-сервером с
+``wsgi.file_wrapper`` он уходит через sendfile без копирования.
+
+Если перед приложением стоит nginx, ``MEDIA_ACCEL_REDIRECT`` задаёт
+internal-location, и файл вместе с Range и проверками кеша отдаёт
+уже сам nginx по заголовку ``X-Accel-Redirect``.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def served_prefixes():
+    """Каталоги ``MEDIA_ROOT``, которые можно отдавать."""
+    return ('posts/', thumbnail_settings.THUMBNAIL_PREFIX)
+
+
+def media_file(path):
+    """(путь в ``MEDIA_ROOT`` без '..', полный путь, stat) или 404."""
+    # Каталог проверяется после разбора '..': posts/../x - не posts/.
+    path = posixpath.normpath(path)
+    if not path.startswith(served_prefixes()):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        file_stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404
+    return path, full_path, file_stat
+
+
+def parse_range(header, size):
+    """(начало, конец включительно) из Range, None - отдать целиком.
+
+    Несколько диапазонов и непонятный заголовок отдаются целым файлом,
+    недостижимый диапазон и любой диапазон пустого файла - ValueError.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None or match.group(0) == 'bytes=-':
+        return None
+    start, end = match.groups()
+    if size == 0:
+        raise ValueError(header)
+    if not start:
+        # bytes=-N: последние N байт.
+        length = int(end)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _if_range_passes(request, etag, mtime):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+class FileRange:
+    """Часть файла с ``start`` длиной ``length`` для FileResponse."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def serve_media(request, path):
+    path, full_path, file_stat = media_file(path)
+    size = file_stat.st_size
+    etag = quote_etag(f'{file_stat.st_mtime_ns:x}-{size:x}')
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(file_stat.st_mtime),
+        'Cache-Control': f'public, max-age={settings.MEDIA_MAX_AGE}',
+        'Accept-Ranges': 'bytes',
+    }
+    content_type, _ = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    accel = settings.MEDIA_ACCEL_REDIRECT
+    if accel:
+        response = HttpResponse(content_type=content_type)
+        # Заголовок только ASCII: иначе Django кодирует его по MIME,
+        # и nginx не находит файл с кириллицей в имени.
+        response['X-Accel-Redirect'] = quote(f'{accel}{path}')
+        return response
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(file_stat.st_mtime)
+    )
+    if response is None:
+        response = _file_response(
+            request, full_path, file_stat, etag, content_type
+        )
+    if response.status_code in (200, 206, 304):
+        for header, value in headers.items():
+            response[header] = value
+    return response
+
+
+def _file_response(request, full_path, file_stat, etag, content_type):
+    size = file_stat.st_size
+    header = request.META.get('HTTP_RANGE')
+    file_range = None
+    if header and _if_range_passes(request, etag, file_stat.st_mtime):
+        try:
+            file_range = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    file = open(full_path, 'rb')
+    if file_range is None:
+        return FileResponse(file, content_type=content_type)
+    start, end = file_range
+    response = FileResponse(
+        FileRange(file, start, end - start + 1),
+        status=206,
+        content_type=content_type,
+    )
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
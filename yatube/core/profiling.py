@@ -0,0 +1,174 @@
+"""Время отрисовки шаблонов, include и своих тегов по запросам.
+
+Включается настройкой ``TEMPLATE_PROFILING_ENABLED``: тогда при старте
+подменяются ``Template._render`` и ``Node.render_annotated``. Меряются
+каждый шаблон (в том числе подключённый через include), теги и фильтры
+не из Django - ``post_cards``, ``thumbnail``, ``addclass`` и другие.
+Для каждой метки копятся число вызовов, полное время и собственное -
+без вложенных шаблонов и тегов.
+
+``TemplateProfilerMiddleware`` складывает замеры по имени view
+и отдаёт сотрудникам самые долгие метки запроса в заголовке
+``Server-Timing``.
+Накопленное по всем запросам видно сотрудникам на ``/debug/templates/``.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template import base
+from django.template.library import InclusionNode, SimpleNode
+
+# Сколько самых долгих меток запроса отдавать в Server-Timing.
+SERVER_TIMING_LIMIT = 10
+
+_recorder = ContextVar('render_recorder', default=None)
+_installed = False
+
+
+def _own(func):
+    """Написано не в Django: в проекте или в сторонней библиотеке."""
+    return not getattr(func, '__module__', '').startswith('django.')
+
+
+def _label(node):
+    """Метка узла шаблона или None, если его отдельно не меряем."""
+    if isinstance(node, (SimpleNode, InclusionNode)):
+        return f'tag:{node.func.__name__}'
+    if isinstance(node, base.VariableNode):
+        names = [
+            func.__name__
+            for func, _ in node.filter_expression.filters if _own(func)
+        ]
+        return f'filter:{",".join(names)}' if names else None
+    if _own(type(node)):
+        return f'tag:{type(node).__name__}'
+    return None
+
+
+class RenderRecorder:
+    """Замеры отрисовки одного запроса: {метка: [число, всего, своё]}."""
+
+    def __init__(self):
+        self.timings = defaultdict(lambda: [0, 0.0, 0.0])
+        self._children = []
+
+    def measure(self, label, render, *args):
+        started = time.perf_counter()
+        self._children.append(0.0)
+        try:
+            return render(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+            stats = self.timings[label]
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] += elapsed - children
+
+    def top(self, limit=SERVER_TIMING_LIMIT):
+        """Метки с наибольшим собственным временем."""
+        return sorted(
+            self.timings.items(), key=lambda item: item[1][2], reverse=True
+        )[:limit]
+
+    def server_timing(self):
+        return ', '.join(
+            f'render-{number};desc="{label}";dur={own * 1000:.2f}'
+            for number, (label, (_, _, own)) in enumerate(self.top(), 1)
+        )
+
+
+def install():
+    """Подменяет методы отрисовки; без активного замера они как были."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    render_template = base.Template._render
+    render_node = base.Node.render_annotated
+
+    def _render(self, context):
+        recorder = _recorder.get()
+        if recorder is None:
+            return render_template(self, context)
+        return recorder.measure(
+            f'template:{self.name}', render_template, self, context
+        )
+
+    def render_annotated(self, context):
+        recorder = _recorder.get()
+        if recorder is None:
+            return render_node(self, context)
+        try:
+            label = self._profile_label
+        except AttributeError:
+            label = self._profile_label = _label(self)
+        if label is None:
+            return render_node(self, context)
+        return recorder.measure(label, render_node, self, context)
+
+    base.Template._render = _render
+    base.Node.render_annotated = render_annotated
+
+
+_stats = defaultdict(lambda: defaultdict(lambda: [0, 0.0, 0.0]))
+_stats_lock = threading.Lock()
+
+
+def render_stats():
+    """Накопленное по view: {view: {метка: {calls, total_ms, own_ms}}}."""
+    with _stats_lock:
+        return {
+            view: {
+                label: {
+                    'calls': calls,
+                    'total_ms': round(total * 1000, 3),
+                    'own_ms': round(own * 1000, 3),
+                }
+                for label, (calls, total, own) in sorted(
+                    labels.items(), key=lambda item: item[1][2],
+                    reverse=True,
+                )
+            }
+            for view, labels in _stats.items()
+        }
+
+
+def reset_render_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class TemplateProfilerMiddleware:
+    """Меряет отрисовку шаблонов запроса и копит итоги по view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'TEMPLATE_PROFILING_ENABLED', False):
+            return self.get_response(request)
+        recorder = RenderRecorder()
+        token = _recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else request.path_info
+        with _stats_lock:
+            stats = _stats[view]
+            for label, (calls, total, own) in recorder.timings.items():
+                stats[label][0] += calls
+                stats[label][1] += total
+                stats[label][2] += own
+        # Имена шаблонов и тегов видны только сотрудникам.
+        user = getattr(request, 'user', None)
+        if recorder.timings and user is not None and user.is_staff:
+            response['Server-Timing'] = recorder.server_timing()
+        return response
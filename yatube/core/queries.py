@@ -0,0 +1,206 @@
+"""Учёт SQL-запросов: число, время и повторы (N+1) по view.
+
+``QueryRecorder`` записывает запросы через ``execute_wrapper`` всех
+соединений. Одинаковые по форме запросы (отпечаток - SQL без
+параметров) повторяются при N+1; для них запоминается место в шаблоне
+или в коде проекта, откуда они пришли.
+
+``QueryBudgetMiddleware`` копит статистику по имени view и пишет
+в лог найденные N+1, ``QueryBudgetMixin`` даёт тестам
+``assertQueryBudget``.
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.urls import resolve
+from django.urls.exceptions import Resolver404
+
+logger = logging.getLogger(__name__)
+
+# Сколько одинаковых запросов за запрос считаются N+1.
+NPLUSONE_THRESHOLD = 3
+# Сколько шагов стека смотреть в поисках места запроса.
+STACK_DEPTH = 60
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_SKIP_DIRS = (
+    os.path.dirname(os.path.abspath(__file__)),
+    os.path.dirname(os.path.abspath(os.__file__)),
+)
+
+
+def fingerprint(sql):
+    """Форма запроса: списки IN (...) любой длины совпадают."""
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+def _location():
+    # Сначала ищем узел шаблона, затем первый кадр кода проекта.
+    frame = sys._getframe(2)
+    code_location = None
+    for _ in range(STACK_DEPTH):
+        if frame is None:
+            break
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                return f'{origin.template_name}:{token.lineno}'
+        filename = frame.f_code.co_filename
+        if (
+            code_location is None
+            and filename.startswith(str(settings.BASE_DIR))
+            and not filename.startswith(_SKIP_DIRS)
+            and 'site-packages' not in filename
+        ):
+            filename = os.path.relpath(filename, settings.BASE_DIR)
+            code_location = f'{filename}:{frame.f_lineno}'
+        frame = frame.f_back
+    return code_location
+
+
+class QueryRecorder:
+    """Записывает запросы ко всем БД внутри блока ``with``.
+
+    ``locate=False`` не ищет место запроса в стеке: так замеры
+    времени меньше искажаются.
+    """
+
+    def __init__(self, locate=True):
+        self.locate = locate
+        self.queries = []
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(
+                connections[alias].execute_wrapper(self)
+            )
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((
+                fingerprint(sql),
+                time.perf_counter() - started,
+                _location() if self.locate else None,
+            ))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration, _ in self.queries)
+
+    def repeated(self, threshold=NPLUSONE_THRESHOLD):
+        """{отпечаток: (число повторов, места)} для повторов N+1."""
+        counts = Counter(sql for sql, _, _ in self.queries)
+        locations = defaultdict(set)
+        for sql, _, location in self.queries:
+            locations[sql].add(location)
+        return {
+            sql: (count, sorted(filter(None, locations[sql])))
+            for sql, count in counts.items()
+            if count >= threshold
+        }
+
+    def report(self):
+        lines = [f'{self.count} запросов, {self.duration * 1000:.1f} мс']
+        for sql, (count, locations) in self.repeated().items():
+            lines.append(f'N+1: {count} x {sql}')
+            lines.extend(f'    из {location}' for location in locations)
+        return '\n'.join(lines)
+
+
+_stats = defaultdict(lambda: {
+    'requests': 0, 'queries': 0, 'duration': 0.0, 'repeated': Counter(),
+})
+_stats_lock = threading.Lock()
+
+
+def view_stats():
+    """Накопленная статистика запросов по именам view."""
+    with _stats_lock:
+        return {
+            view: dict(stats, repeated=dict(stats['repeated']))
+            for view, stats in _stats.items()
+        }
+
+
+def reset_view_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+    return match.view_name
+
+
+class QueryBudgetMiddleware:
+    """Считает запросы каждого view и предупреждает о N+1.
+
+    Включается настройкой ``QUERY_BUDGET_ENABLED``. В ответ добавляются
+    заголовки ``X-Query-Count`` и ``X-Query-Time``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+            return self.get_response(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        view = _view_name(request) or request.path_info
+        repeated = recorder.repeated()
+        with _stats_lock:
+            stats = _stats[view]
+            stats['requests'] += 1
+            stats['queries'] += recorder.count
+            stats['duration'] += recorder.duration
+            stats['repeated'].update(repeated.keys())
+        if repeated:
+            logger.warning('%s: %s', view, recorder.report())
+        response['X-Query-Count'] = str(recorder.count)
+        response['X-Query-Time'] = f'{recorder.duration * 1000:.1f}'
+        return response
+
+
+class QueryBudgetMixin:
+    """Проверки бюджета запросов для TestCase."""
+
+    def assertQueryBudget(self, budget, func, *args, allow_repeats=False,
+                          **kwargs):
+        """Вызов ``func`` укладывается в ``budget`` запросов без N+1."""
+        with QueryRecorder() as recorder:
+            result = func(*args, **kwargs)
+        if recorder.count > budget:
+            self.fail(
+                f'Бюджет {budget} запросов превышен.\n{recorder.report()}'
+            )
+        if not allow_repeats and recorder.repeated():
+            self.fail(f'Найден N+1.\n{recorder.report()}')
+        return result
@@ -0,0 +1,38 @@
+"""Прогон тестов с кешем во временном каталоге.
+
+Страницы и версии лент из тестов не попадают в кеш сайта
+в ``BASE_DIR/.cache``, а параллельные прогоны не делят один кеш.
+"""
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+@contextmanager
+def temp_cache():
+    """Переносит ``CACHES['default']`` во временный каталог."""
+    location = tempfile.mkdtemp()
+    caches = {
+        **settings.CACHES,
+        'default': {**settings.CACHES['default'], 'LOCATION': location},
+    }
+    try:
+        with override_settings(CACHES=caches):
+            yield location
+    finally:
+        shutil.rmtree(location, ignore_errors=True)
+
+
+class TempCacheRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._temp_cache = temp_cache()
+        self._temp_cache.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._temp_cache.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,140 @@
+"""Статика с хешем в имени, сжатыми копиями и раздачей без Django.
+
+``CompressedManifestStorage`` при ``collectstatic`` пишет рядом с каждым
+файлом копию с хешем содержимого в имени (``ManifestStaticFilesStorage``)
+и для текстовых файлов - сжатую ``.gz``, если она меньше исходной.
+
+``StaticFilesApp`` оборачивает WSGI-приложение: запросы к ``STATIC_URL``
+отдаются прямо из ``STATIC_ROOT``, не доходя до middleware и view.
+Список файлов читается один раз при старте. Клиенту, принимающему gzip,
+уходит сжатая копия; файлы с хешем в имени кешируются навсегда
+(``immutable``), остальные - на ``STATIC_MAX_AGE`` секунд.
+"""
+import gzip
+import json
+import mimetypes
+import os
+from email.utils import formatdate
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+COMPRESS_EXTENSIONS = (
+    '.css', '.js', '.map', '.svg', '.txt', '.html', '.json', '.xml',
+)
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+BLOCK_SIZE = 64 * 1024
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    """Файлы с хешем содержимого в имени и их сжатые копии."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in paths:
+            for path in {name, self.stored_name(name)}:
+                if self.compress(path):
+                    yield path, f'{path}.gz', True
+
+    def compress(self, path):
+        """Пишет ``path.gz``, если сжатие что-то даёт."""
+        if not path.endswith(COMPRESS_EXTENSIONS):
+            return False
+        with self.open(path) as source:
+            content = source.read()
+        # mtime=0: одинаковый файл сжимается в одинаковые байты.
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        if len(compressed) >= len(content):
+            return False
+        if self.exists(f'{path}.gz'):
+            self.delete(f'{path}.gz')
+        self._save(f'{path}.gz', ContentFile(compressed))
+        return True
+
+
+def _headers(path, cache_control):
+    stat = os.stat(path)
+    # Для .gz отдаётся тип исходного файла.
+    content_type, _ = mimetypes.guess_type(path)
+    return [
+        ('Content-Type', content_type or 'application/octet-stream'),
+        ('Content-Length', str(stat.st_size)),
+        ('Last-Modified', formatdate(stat.st_mtime, usegmt=True)),
+        ('Cache-Control', cache_control),
+    ]
+
+
+def collect_files(root):
+    """{путь от корня: (файл, заголовки, сжатый файл, его заголовки)}."""
+    try:
+        with open(os.path.join(root, 'staticfiles.json')) as manifest:
+            hashed = set(json.load(manifest)['paths'].values())
+    except (OSError, ValueError, KeyError):
+        hashed = set()
+    short_cache = f'public, max-age={settings.STATIC_MAX_AGE}'
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            url = os.path.relpath(path, root).replace(os.sep, '/')
+            if url.endswith('.gz') or url == 'staticfiles.json':
+                continue
+            cache_control = (
+                IMMUTABLE_CACHE if url in hashed else short_cache
+            )
+            headers = _headers(path, cache_control)
+            compressed = f'{path}.gz'
+            if os.path.isfile(compressed):
+                compressed_headers = _headers(compressed, cache_control) + [
+                    ('Content-Encoding', 'gzip'),
+                    ('Vary', 'Accept-Encoding'),
+                ]
+                headers.append(('Vary', 'Accept-Encoding'))
+            else:
+                compressed = compressed_headers = None
+            files[url] = (path, headers, compressed, compressed_headers)
+    return files
+
+
+class StaticFilesApp:
+    """Отдаёт собранную статику до Django, остальное - приложению."""
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.prefix = prefix or settings.STATIC_URL
+        root = root or settings.STATIC_ROOT
+        self.files = collect_files(root) if root else {}
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if (
+            environ['REQUEST_METHOD'] not in ('GET', 'HEAD')
+            or not path.startswith(self.prefix)
+        ):
+            return self.application(environ, start_response)
+        found = self.files.get(path[len(self.prefix):])
+        if found is None:
+            return self.application(environ, start_response)
+        path, headers, compressed, compressed_headers = found
+        if compressed and 'gzip' in environ.get('HTTP_ACCEPT_ENCODING', ''):
+            path, headers = compressed, compressed_headers
+        start_response('200 OK', list(headers))
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        file = open(path, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(file, BLOCK_SIZE)
+        return _read_blocks(file)
+
+
+def _read_blocks(file):
+    with file:
+        while True:
+            block = file.read(BLOCK_SIZE)
+            if not block:
+                return
+            yield block
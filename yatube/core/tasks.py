@@ -0,0 +1,49 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import close_caches
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.TASKS_WORKERS,
+                thread_name_prefix='yatube-tasks',
+            )
+    return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Фоновая задача %s завершилась ошибкой', func)
+    finally:
+        # У каждого потока свои соединения с БД и экземпляры кеша -
+        # закрываем их сами, как Django в конце запроса.
+        connections.close_all()
+        close_caches()
+
+
+def submit(func, *args, **kwargs):
+    """Выполняет задачу в фоновом потоке после фиксации транзакции.
+
+    При ``TASKS_ASYNC = False`` (разработка и тесты) задача
+    выполняется сразу, в том же потоке.
+    """
+    if not settings.TASKS_ASYNC:
+        func(*args, **kwargs)
+        return
+    transaction.on_commit(
+        lambda: _get_executor().submit(_run, func, args, kwargs)
+    )
@@ -0,0 +1,82 @@
+import shutil
+import tempfile
+
+from django.db import transaction
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings)
+
+from posts.models import Comment, Post, User
+
+from .. import benchmark
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+class BenchmarkTests(SimpleTestCase):
+    def test_percentile(self):
+        """перцентили считаются методом ближайшего ранга"""
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 95), 7)
+
+    def test_compare(self):
+        """замедление и лишние запросы считаются регрессией"""
+        baseline = {'routes': {
+            'posts:index': {'p95': 10.0, 'queries': 3},
+            'posts:profile': {'p95': 10.0, 'queries': 3},
+        }}
+        result = {'routes': {
+            'posts:index': {'p95': 11.0, 'queries': 3},
+            'posts:profile': {'p95': 30.0, 'queries': 4},
+            'posts:new': {'p95': 99.0, 'queries': 99},
+        }}
+        regressions = benchmark.compare(result, baseline)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(
+            all(line.startswith('posts:profile') for line in regressions)
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GenerateDatasetTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def generate(self):
+        with transaction.atomic():
+            benchmark.generate_dataset(
+                users=5, posts=20, comments=10, follows=5, images_count=2,
+                groups=2, seed=7,
+            )
+            snapshot = (
+                list(User.objects.order_by('pk').values_list(
+                    'username', 'email', 'first_name'
+                )),
+                list(Post.objects.order_by('pk').values_list(
+                    'author__username', 'text'
+                )),
+                list(Post.objects.exclude(image='').order_by('pk')
+                     .values_list('pk', flat=True)),
+            )
+            transaction.set_rollback(True)
+        return snapshot
+
+    def test_same_seed_same_data(self):
+        """один seed даёт те же данные и те же посты с картинками"""
+        first = self.generate()
+        self.assertEqual(len(first[2]), 2)
+        self.assertEqual(self.generate(), first)
+
+
+class ConcurrencyBenchmarkTests(TransactionTestCase):
+    def test_concurrency(self):
+        """прогон пишет и читает копию БД из нескольких потоков"""
+        for pragmas, persistent in benchmark.sqlite_profiles().values():
+            with self.subTest(pragmas=pragmas):
+                result = benchmark.concurrency(2, 2, 0.2, pragmas, persistent)
+                self.assertGreater(result['writes'], 0)
+                self.assertGreater(result['reads'], 0)
+        self.assertEqual(Comment.objects.count(), 0)
@@ -0,0 +1,75 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from .. import cache as tiered
+from ..cache import TieredCache
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.cache = TieredCache(self.location, {})
+        self.cache.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.location, ignore_errors=True)
+
+    def other_worker_sets(self, key, value):
+        """Запись в L2 из другого процесса."""
+        key = self.cache.make_key(key)
+        self.cache._l2.set(key, value)
+        self.cache._log.write('другой процесс', [key])
+
+    def test_l1_invalidated_by_other_worker(self):
+        """L1 отбрасывает ключ, изменённый другим процессом."""
+        self.cache.set('key', 'старое')
+        self.other_worker_sets('key', 'новое')
+        self.assertEqual(self.cache.get('key'), 'старое')
+        self.cache.sync()
+        self.assertEqual(self.cache.get('key'), 'новое')
+
+    def test_read_through_and_delete(self):
+        """L2 общий для процессов, удаление видно после синхронизации."""
+        self.other_worker_sets('key', 'значение')
+        self.assertEqual(self.cache.get_many(['key']), {'key': 'значение'})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'снова'))
+        self.assertFalse(self.cache.add('key', 'занято'))
+
+    def log_keys(self):
+        return [
+            key for _, key in self.cache._log.connection.execute(
+                'SELECT seq, key FROM invalidations ORDER BY seq'
+            )
+        ]
+
+    def test_log_writes_coalesced(self):
+        """ключи запроса пишутся в журнал одной пачкой без повторов"""
+        self.cache.flush()
+        before = self.log_keys()
+        for value in range(3):
+            self.cache.set('key', value)
+            self.cache.set_many({'other': value})
+        self.assertEqual(self.log_keys(), before)
+        self.cache.close()
+        keys = self.log_keys()[len(before):]
+        self.assertEqual(sorted(keys), [':1:key', ':1:other'])
+
+    def test_cull_checked_rarely(self):
+        """каталог L2 обходится раз в CULL_CHECK_EVERY записей"""
+        with mock.patch.object(
+            self.cache._l2, '_list_cache_files', return_value=[]
+        ) as listed:
+            for number in range(tiered.CULL_CHECK_EVERY * 2):
+                self.cache.set(f'key_{number}', number)
+        self.assertEqual(listed.call_count, 2)
+
+    def test_tests_use_temporary_cache(self):
+        """тесты не пишут в кеш сайта"""
+        self.assertNotIn(settings.BASE_DIR, cache._l2._dir)
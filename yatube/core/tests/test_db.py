@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import OperationalError
+from django.http import HttpResponse
+from django.test import (RequestFactory, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import resolve
+
+from posts.models import Post, User
+
+from .. import db
+
+router = db.ReplicaRouter()
+
+
+@override_settings(REPLICA_DATABASES=['replica'], REPLICA_MAX_LAG=60)
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        db._down.clear()
+        cache.clear()
+        cache.set(db.HEARTBEAT_KEY.format('replica'), time.time(), None)
+        self.factory = RequestFactory()
+
+    def handle(self, request, view=None):
+        """Запрос через middleware: (БД чтения во view, ответ)."""
+        used = []
+
+        def get_response(request):
+            used.append(router.db_for_read(Post))
+            if view is not None:
+                view()
+            return HttpResponse()
+
+        response = db.ReplicaMiddleware(get_response)(request)
+        return used[0], response
+
+    def test_reads_from_replica(self):
+        """страницы постов читают с реплики, POST - с основной БД"""
+        self.assertEqual(self.handle(self.factory.get('/'))[0], 'replica')
+        self.assertEqual(self.handle(self.factory.post('/'))[0], 'default')
+        self.assertEqual(
+            self.handle(self.factory.get('/admin/'))[0], 'default'
+        )
+        self.assertEqual(
+            self.handle(self.factory.get('/profile/leo/follow/'))[0],
+            'default',
+        )
+        self.assertIsNone(router.db_for_read(Post))
+
+    def test_write_sticks_to_primary(self):
+        """после записи пользователь читает реплики не старше записи"""
+        alias, response = self.handle(
+            self.factory.get('/'), lambda: router.db_for_write(Post)
+        )
+        self.assertEqual(alias, 'replica')
+        cookie = response.cookies[db.WROTE_COOKIE]
+        self.assertEqual(cookie['max-age'], 60)
+        request = self.factory.get('/')
+        request.COOKIES[db.WROTE_COOKIE] = cookie.value
+        self.assertEqual(self.handle(request)[0], 'default')
+        # Реплику синхронизировали после записи.
+        cache.set(
+            db.HEARTBEAT_KEY.format('replica'),
+            float(cookie.value) + 1, None,
+        )
+        self.assertEqual(self.handle(request)[0], 'replica')
+        request.COOKIES[db.WROTE_COOKIE] = 'испорчено'
+        self.assertEqual(self.handle(request)[0], 'replica')
+
+    def test_failover_and_lag(self):
+        """упавшая или отставшая реплика не используется"""
+        request = self.factory.get('/')
+        request.resolver_match = resolve('/')
+        request.user = AnonymousUser()
+        token = db._state.set({'alias': 'replica', 'wrote': False})
+        try:
+            response = db.ReplicaMiddleware(None).process_exception(
+                request, OperationalError('no such table')
+            )
+        finally:
+            db._state.reset(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.handle(self.factory.get('/'))[0], 'default')
+        db._down.clear()
+        cache.set(
+            db.HEARTBEAT_KEY.format('replica'), time.time() - 3600, None
+        )
+        self.assertEqual(self.handle(self.factory.get('/'))[0], 'default')
+        cache.delete(db.HEARTBEAT_KEY.format('replica'))
+        self.assertEqual(self.handle(self.factory.get('/'))[0], 'default')
+
+
+class CopySqliteTests(TransactionTestCase):
+    # Копия снимается только с зафиксированных данных.
+    def test_copy_sqlite(self):
+        """копия SQLite содержит данные основной БД"""
+        Post.objects.create(
+            author=User.objects.create_user(username='leo'), text='Пост'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'replica.sqlite3')
+            db.copy_sqlite(path)
+            replica = sqlite3.connect(path)
+            texts = replica.execute('SELECT text FROM posts_post').fetchall()
+            replica.close()
+        self.assertEqual(texts, [('Пост',)])
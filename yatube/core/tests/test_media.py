@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+
+CONTENT = bytes(range(256)) * 4
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+URL = '/media/posts/small.gif'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_ACCEL_REDIRECT='')
+class MediaViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for directory in ('posts', 'private'):
+            os.makedirs(os.path.join(TEMP_MEDIA_ROOT, directory))
+            path = os.path.join(TEMP_MEDIA_ROOT, directory, 'small.gif')
+            with open(path, 'wb') as file:
+                file.write(CONTENT)
+        open(os.path.join(TEMP_MEDIA_ROOT, 'posts', 'empty.gif'), 'wb').close()
+        path = os.path.join(TEMP_MEDIA_ROOT, 'posts', 'котик.gif')
+        with open(path, 'wb') as file:
+            file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_whole_file(self):
+        """файл отдаётся целиком с ETag и Last-Modified"""
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.content(response), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response['Last-Modified'])
+
+    def test_not_modified(self):
+        """совпавшие ETag или дата дают 304"""
+        first = self.client.get(URL)
+        for header, value in (
+            ('HTTP_IF_NONE_MATCH', first['ETag']),
+            ('HTTP_IF_MODIFIED_SINCE', first['Last-Modified']),
+        ):
+            with self.subTest(header=header):
+                response = self.client.get(URL, **{header: value})
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], first['ETag'])
+
+    def test_range(self):
+        """Range отдаёт часть файла, недостижимый - 416"""
+        for header, start, end in (
+            ('bytes=10-19', 10, 19),
+            ('bytes=1000-', 1000, 1023),
+            ('bytes=-5', 1019, 1023),
+            ('bytes=1020-5000', 1020, 1023),
+        ):
+            with self.subTest(header=header):
+                response = self.client.get(URL, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(
+                    self.content(response), CONTENT[start:end + 1]
+                )
+                self.assertEqual(
+                    response['Content-Range'], f'bytes {start}-{end}/1024'
+                )
+                self.assertEqual(
+                    response['Content-Length'], str(end - start + 1)
+                )
+        response = self.client.get(URL, HTTP_RANGE='bytes=1024-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+        for header in ('bytes=-5', 'bytes=0-'):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    '/media/posts/empty.gif', HTTP_RANGE=header
+                )
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_if_range(self):
+        """при изменившемся файле If-Range отдаёт его целиком"""
+        etag = self.client.get(URL)['ETag']
+        response = self.client.get(
+            URL, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag
+        )
+        self.assertEqual(response.status_code, 206)
+        response = self.client.get(
+            URL, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.content(response), CONTENT)
+
+    def test_only_served_directories(self):
+        """файлы вне posts/ и миниатюр не отдаются"""
+        for url in (
+            '/media/private/small.gif',
+            '/media/posts/missing.gif',
+            '/media/posts/',
+            '/media/posts/../private/small.gif',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.post(URL).status_code, 405)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/')
+    def test_accel_redirect(self):
+        """за nginx файл отдаётся через X-Accel-Redirect"""
+        response = self.client.get(URL)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/small.gif'
+        )
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response.content, b'')
+        response = self.client.get('/media/posts/x/../котик.gif')
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/protected-media/posts/%D0%BA%D0%BE%D1%82%D0%B8%D0%BA.gif',
+        )
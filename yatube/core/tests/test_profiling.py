@@ -0,0 +1,78 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from .. import profiling
+
+
+@override_settings(TEMPLATE_PROFILING_ENABLED=True)
+class TemplateProfilerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        profiling.install()
+        cls.user = User.objects.create_user(username='leo')
+        cls.post = Post.objects.create(text='Текст поста', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        profiling.reset_render_stats()
+        self.addCleanup(profiling.reset_render_stats)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_profile_render_timings(self):
+        """шаблоны, include и свои теги меряются по view"""
+        url = reverse('posts:profile', kwargs={'username': 'leo'})
+        for client in (self.client, self.authorized_client):
+            with self.subTest(client=client):
+                cache.clear()
+                self.assertNotIn('Server-Timing', client.get(url))
+                self.assertIn('posts:profile', profiling.render_stats())
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        cache.clear()
+        profiling.reset_render_stats()
+        response = self.authorized_client.get(url)
+        self.assertIn('desc="', response['Server-Timing'])
+        labels = profiling.render_stats()['posts:profile']
+        for label in (
+            'template:posts/profile.html',
+            'template:base.html',
+            'template:includes/header.html',
+            'tag:post_cards',
+        ):
+            with self.subTest(label=label):
+                self.assertEqual(labels[label]['calls'], 1)
+        page = labels['template:base.html']
+        self.assertLessEqual(page['own_ms'], page['total_ms'])
+
+    def test_own_filters(self):
+        """свои фильтры меряются, встроенные - нет"""
+        self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        labels = profiling.render_stats()['posts:post_detail']
+        self.assertIn('filter:addclass', labels)
+        self.assertFalse(
+            [label for label in labels if label.startswith('tag:If')]
+        )
+
+    @override_settings(TEMPLATE_PROFILING_ENABLED=False)
+    def test_disabled(self):
+        """без настройки замеров и заголовка нет"""
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(profiling.render_stats(), {})
+
+    def test_stats_for_staff_only(self):
+        """накопленные замеры видны только сотрудникам"""
+        url = reverse('template_profile')
+        self.assertEqual(self.authorized_client.get(url).status_code, 302)
+        self.authorized_client.get(reverse('posts:index'))
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        response = self.authorized_client.get(url)
+        self.assertIn(
+            'template:posts/index.html', response.json()['posts:index']
+        )
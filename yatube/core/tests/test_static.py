@@ -0,0 +1,102 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from ..static import IMMUTABLE_CACHE, StaticFilesApp
+
+CSS = 'body { color: #000; }\n' * 100
+
+
+class StaticFilesTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.source = tempfile.mkdtemp()
+        cls.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(cls.source, 'css'))
+        with open(os.path.join(cls.source, 'css', 'site.css'), 'w') as css:
+            css.write(CSS)
+        with override_settings(
+            STATICFILES_DIRS=[cls.source],
+            STATIC_ROOT=cls.root,
+            STATICFILES_STORAGE='core.static.CompressedManifestStorage',
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(cls.root, 'staticfiles.json')) as manifest:
+            cls.hashed = json.load(manifest)['paths']['css/site.css']
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.source, ignore_errors=True)
+        shutil.rmtree(cls.root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.passed = []
+        self.app = StaticFilesApp(self.django_app, root=self.root)
+
+    def django_app(self, environ, start_response):
+        self.passed.append(environ['PATH_INFO'])
+        start_response('404 Not Found', [])
+        return [b'']
+
+    def get(self, path, method='GET', **environ):
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        body = b''.join(self.app(
+            {'REQUEST_METHOD': method, 'PATH_INFO': path, **environ},
+            start_response,
+        ))
+        return response['status'], response['headers'], body
+
+    def test_collectstatic_writes_hashed_and_compressed(self):
+        """collectstatic пишет имя с хешем и сжатые копии"""
+        self.assertNotEqual(self.hashed, 'css/site.css')
+        for name in ('css/site.css', self.hashed):
+            with self.subTest(name=name):
+                path = os.path.join(self.root, f'{name}.gz')
+                with open(path, 'rb') as compressed:
+                    self.assertEqual(
+                        gzip.decompress(compressed.read()).decode(), CSS
+                    )
+
+    def test_serves_compressed_immutable(self):
+        """файл с хешем отдаётся сжатым и кешируется навсегда"""
+        status, headers, body = self.get(
+            f'/static/{self.hashed}', HTTP_ACCEPT_ENCODING='gzip, br'
+        )
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Content-Type'], 'text/css')
+        self.assertEqual(headers['Cache-Control'], IMMUTABLE_CACHE)
+        self.assertEqual(headers['Content-Length'], str(len(body)))
+        self.assertEqual(gzip.decompress(body).decode(), CSS)
+        self.assertEqual(self.passed, [])
+
+    def test_serves_plain(self):
+        """без gzip - исходный файл, имя без хеша кешируется ненадолго"""
+        status, headers, body = self.get(f'/static/{self.hashed}')
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(body.decode(), CSS)
+        status, headers, body = self.get(
+            '/static/css/site.css', method='HEAD'
+        )
+        self.assertEqual(status, '200 OK')
+        self.assertNotEqual(headers['Cache-Control'], IMMUTABLE_CACHE)
+        self.assertEqual(body, b'')
+
+    def test_other_requests_go_to_django(self):
+        """остальные запросы уходят в приложение"""
+        for path in ('/', '/static/css/missing.css', '/static/../x'):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path)[0], '404 Not Found')
+        self.assertEqual(len(self.passed), 3)
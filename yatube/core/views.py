@@ -1,4 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_safe
+
+from .media import serve_media
+from .profiling import render_stats
 
 
 def page_not_found(request, exception):
@@ -7,3 +13,15 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def template_profile(request):
+    return JsonResponse(
+        render_stats(), json_dumps_params={'ensure_ascii': False}
+    )
+
+
+@require_safe
+def media(request, path):
+    return serve_media(request, path)
@@ -0,0 +1,178 @@
+"""JSON API лент только для чтения: /api/v1/.
+
+Повторяет ленты из ``posts.urls``. Поля выбираются параметром
+``?fields=id,text`` (у комментариев - ``?comment_fields=``), страницы
+листаются курсорами ``?after=`` и ``?before=``. На каждый ответ
+ставится сильный ETag по последнему посту и версиям лент, поэтому
+повторный запрос с ``If-None-Match`` получает 304, не загружая постов.
+"""
+import hashlib
+
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_safe
+
+from . import versions
+from .models import Group, Post, User
+from .paginators import CursorPaginator, InvalidCursor
+
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+POST_FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date.isoformat(),
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: post.image.url if post.image else None,
+    'comments_count': lambda post: post.comments_count,
+    'views': lambda post: post.views,
+}
+COMMENT_FIELDS = {
+    'id': lambda comment: comment.pk,
+    'text': lambda comment: comment.text,
+    'pub_date': lambda comment: comment.pub_date.isoformat(),
+    'author': lambda comment: comment.author.username,
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _etag(request, *state):
+    source = '|'.join(map(str, (request.get_full_path(), *state)))
+    return hashlib.md5(source.encode()).hexdigest()
+
+
+def _fields(request, available, param='fields'):
+    names = request.GET.get(param)
+    if not names:
+        return available
+    selected = {}
+    for name in names.split(','):
+        if name not in available:
+            raise BadRequest(f'Неизвестное поле: {name}')
+        selected[name] = available[name]
+    return selected
+
+
+def _page(request, queryset):
+    try:
+        per_page = int(request.GET.get('limit', API_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('Некорректный limit')
+    per_page = max(1, min(per_page, API_MAX_PAGE_SIZE))
+    paginator = CursorPaginator(queryset, per_page)
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    try:
+        if after or before:
+            return paginator.cursor_page(after=after, before=before)
+        return paginator.first_page()
+    except InvalidCursor as error:
+        raise BadRequest(str(error))
+
+
+def _serialize_page(request, queryset, fields):
+    page = _page(request, queryset)
+    rows = list(page)
+    cursor_for = page.paginator.cursor_for
+    return {
+        'results': [
+            {name: get(obj) for name, get in fields.items()} for obj in rows
+        ],
+        'next': cursor_for(rows[-1]) if rows and page.has_next() else None,
+        'previous': (
+            cursor_for(rows[0]) if rows and page.has_previous() else None
+        ),
+    }
+
+
+def api_view(etag_func):
+    """Обёртка API: только GET/HEAD, ETag и ошибки в JSON."""
+    def decorator(view):
+        @require_safe
+        @condition(etag_func=etag_func)
+        def wrapper(request, *args, **kwargs):
+            try:
+                data = view(request, *args, **kwargs)
+            except BadRequest as error:
+                return JsonResponse({'error': str(error)}, status=400)
+            except Http404:
+                return JsonResponse({'error': 'Не найдено'}, status=404)
+            return JsonResponse(
+                data, json_dumps_params={'ensure_ascii': False}
+            )
+        return wrapper
+    return decorator
+
+
+def _feed_etag(get_posts, get_scopes):
+    # В ответе есть просмотры: ETag зависит и от их версии.
+    def etag(request, *args, **kwargs):
+        return _etag(request, *versions.feed_state(
+            get_posts(*args, **kwargs),
+            *get_scopes(*args, **kwargs),
+            versions.VIEWS,
+        ))
+    return etag
+
+
+def _post_etag(request, post_id):
+    state = Post.objects.filter(pk=post_id).values_list(
+        'updated_at', 'comments_count', 'author__username'
+    ).first()
+    if state is None:
+        return None
+    return _etag(request, *state, *versions.get_versions(
+        versions.author_scope(state[2]), versions.VIEWS
+    ))
+
+
+def _feed_posts(posts):
+    return posts.select_related('author', 'group')
+
+
+@api_view(_feed_etag(lambda: Post.objects.all(), lambda: [versions.INDEX]))
+def index(request):
+    posts = _feed_posts(Post.objects.all())
+    return _serialize_page(request, posts, _fields(request, POST_FIELDS))
+
+
+@api_view(_feed_etag(
+    lambda slug: Post.objects.filter(group__slug=slug),
+    lambda slug: [versions.group_scope(slug)],
+))
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return _serialize_page(
+        request, _feed_posts(group.posts), _fields(request, POST_FIELDS)
+    )
+
+
+@api_view(_feed_etag(
+    lambda username: Post.objects.filter(author__username=username),
+    lambda username: [versions.author_scope(username)],
+))
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return _serialize_page(
+        request, _feed_posts(author.posts), _fields(request, POST_FIELDS)
+    )
+
+
+@api_view(_post_etag)
+def post_detail(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
+    fields = _fields(request, POST_FIELDS)
+    data = {name: get(post) for name, get in fields.items()}
+    data['comments'] = _serialize_page(
+        request,
+        post.comments.select_related('author'),
+        _fields(request, COMMENT_FIELDS, 'comment_fields'),
+    )
+    return data
@@ -0,0 +1,109 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарно через F() при создании и удалении записей.
+Массовые операции сигналов не вызывают, поэтому для исправления
+расхождений есть ``recount_counters``.
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, User, UserCounter
+
+RECOUNT_BATCH = 1000
+
+
+def _shift(queryset, **deltas):
+    return queryset.update(**{
+        name: F(name) + delta if delta > 0 else Greatest(F(name) + delta, 0)
+        for name, delta in deltas.items()
+    })
+
+
+def change_group(group_id, delta):
+    if group_id is not None:
+        _shift(Group.objects.filter(pk=group_id), posts_count=delta)
+
+
+def change_post(post_id, delta):
+    _shift(Post.objects.filter(pk=post_id), comments_count=delta)
+
+
+def change_user(user_id, **deltas):
+    if _shift(UserCounter.objects.filter(pk=user_id), **deltas):
+        return
+    # Строки ещё нет: создаём её только при увеличении счётчика,
+    # иначе она появилась бы у пользователя, которого удаляют.
+    if any(delta > 0 for delta in deltas.values()):
+        UserCounter.objects.get_or_create(user_id=user_id)
+        _shift(UserCounter.objects.filter(pk=user_id), **deltas)
+
+
+def _count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def id_batches(ids, batch_size):
+    """Отсортированные ``ids`` пачками не больше ``batch_size``."""
+    ids = sorted(ids)
+    for start in range(0, len(ids), batch_size):
+        yield ids[start:start + batch_size]
+
+
+def _batches(queryset, batch_size, ids=None):
+    if ids is not None:
+        # Пересчёт только заданных строк.
+        yield from id_batches(ids, batch_size)
+        return
+    last_pk = None
+    while True:
+        batch = queryset.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        ids = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        last_pk = ids[-1]
+        yield ids
+
+
+def recount_groups(batch_size=RECOUNT_BATCH, ids=None):
+    total = 0
+    for batch in _batches(Group.objects.all(), batch_size, ids):
+        with transaction.atomic():
+            total += Group.objects.filter(pk__in=batch).update(
+                posts_count=_count(Post, 'group')
+            )
+    return total
+
+
+def recount_posts(batch_size=RECOUNT_BATCH, ids=None):
+    total = 0
+    for batch in _batches(Post.objects.all(), batch_size, ids):
+        with transaction.atomic():
+            total += Post.objects.filter(pk__in=batch).update(
+                comments_count=_count(Comment, 'post')
+            )
+    return total
+
+
+def recount_users(batch_size=RECOUNT_BATCH, ids=None):
+    total = 0
+    for batch in _batches(User.objects.all(), batch_size, ids):
+        with transaction.atomic():
+            UserCounter.objects.bulk_create(
+                [UserCounter(user_id=user_id) for user_id in batch],
+                ignore_conflicts=True,
+            )
+            total += UserCounter.objects.filter(pk__in=batch).update(
+                posts_count=_count(Post, 'author'),
+                followers_count=_count(Follow, 'author'),
+                following_count=_count(Follow, 'user'),
+            )
+    return total
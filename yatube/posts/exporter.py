@@ -0,0 +1,135 @@
+"""Потоковая выгрузка постов, комментариев и подписок автора.
+
+Строки читаются из БД через ``iterator(chunk_size=...)`` и сразу
+отдаются наружу, поэтому память не зависит от объёма истории.
+Формат записей тот же, что у ``import_content``. В zip-архив
+дополнительно попадают картинки постов, файлы читаются кусками.
+"""
+import csv
+import json
+import zipfile
+
+from django.core.exceptions import SuspiciousFileOperation
+
+from .models import Comment, Follow, Post
+
+EXPORT_CHUNK = 1000
+FILE_CHUNK = 64 * 1024
+EXPORT_FIELDS = (
+    'type', 'id', 'author', 'group', 'text', 'pub_date', 'post', 'user',
+    'image',
+)
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'zip': 'application/zip',
+}
+
+
+def export_records(author):
+    """Записи автора по одной: посты, комментарии, подписки."""
+    posts = Post.objects.filter(author=author).order_by('pk').values_list(
+        'pk', 'group__slug', 'text', 'pub_date', 'image'
+    )
+    for pk, group, text, pub_date, image in posts.iterator(EXPORT_CHUNK):
+        yield {
+            'type': 'post', 'id': pk, 'author': author.username,
+            'group': group, 'text': text, 'pub_date': pub_date.isoformat(),
+            'image': image or None,
+        }
+    comments = Comment.objects.filter(author=author).order_by(
+        'pk'
+    ).values_list('pk', 'post_id', 'text', 'pub_date')
+    for pk, post_id, text, pub_date in comments.iterator(EXPORT_CHUNK):
+        yield {
+            'type': 'comment', 'id': pk, 'post': post_id,
+            'author': author.username, 'text': text,
+            'pub_date': pub_date.isoformat(),
+        }
+    follows = Follow.objects.filter(user=author).order_by('pk').values_list(
+        'author__username', flat=True
+    )
+    for username in follows.iterator(EXPORT_CHUNK):
+        yield {'type': 'follow', 'user': author.username, 'author': username}
+
+
+class _Buffer:
+    """Файл только для записи: накопленное забирается через ``pop``."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class _TextWriter:
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def write(self, text):
+        return self.buffer.write(text.encode())
+
+
+def _lines(records, file_format):
+    """Записи, переведённые в строки файла выгрузки."""
+    if file_format == 'jsonl':
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+        return
+    buffer = _Buffer()
+    writer = csv.DictWriter(_TextWriter(buffer), EXPORT_FIELDS)
+    writer.writeheader()
+    yield buffer.pop().decode()
+    for record in records:
+        writer.writerow(record)
+        yield buffer.pop().decode()
+
+
+def stream_export(author, file_format='jsonl'):
+    """Байты выгрузки в формате jsonl или csv."""
+    for line in _lines(export_records(author), file_format):
+        yield line.encode()
+
+
+def stream_zip(author, storage, file_format='jsonl'):
+    """Байты zip-архива с выгрузкой и картинками постов."""
+    buffer = _Buffer()
+    # У буфера нет seek: zipfile пишет размеры файлов после данных.
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        name = f'content.{file_format}'
+        with archive.open(name, 'w', force_zip64=True) as entry:
+            for line in _lines(export_records(author), file_format):
+                entry.write(line.encode())
+                yield buffer.pop()
+        images = Post.objects.filter(author=author).exclude(
+            image=''
+        ).order_by('pk').values_list('image', flat=True)
+        for name in images.iterator(EXPORT_CHUNK):
+            try:
+                if not storage.exists(name):
+                    continue
+            except SuspiciousFileOperation:
+                continue
+            with storage.open(name) as source:
+                with archive.open(
+                    f'media/{name}', 'w', force_zip64=True
+                ) as entry:
+                    for chunk in source.chunks(FILE_CHUNK):
+                        entry.write(chunk)
+                        yield buffer.pop()
+    yield buffer.pop()
@@ -0,0 +1,139 @@
+"""RSS и Atom для главной ленты, групп и авторов.
+
+Посты берутся теми же запросами, что и в ``views``. Готовый ответ
+кешируется по версиям лент (``cache_feed``), а ``conditional_feed``
+отвечает 304 на повторный опрос без изменений, не строя ленту.
+"""
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+
+from .models import Group, Post, User
+from .versions import (INDEX, author_scope, cache_feed, conditional_feed,
+                       group_scope)
+
+FEED_COUNT = 20
+FEED_TITLE_LENGTH = 50
+
+
+class PostsFeed(Feed):
+    """Общие поля элемента ленты: пост."""
+
+    def item_title(self, item):
+        return item.text[:FEED_TITLE_LENGTH]
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=(item.pk,))
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_author_link(self, item):
+        return reverse('posts:profile', args=(item.author.username,))
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group_id else []
+
+
+class IndexFeed(PostsFeed):
+    title = 'Yatube: последние обновления'
+    description = 'Последние записи на сайте'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return Post.objects.select_related(
+            'author', 'group'
+        )[:FEED_COUNT]
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', args=(group.slug,))
+
+    def items(self, group):
+        return group.posts.select_related('author', 'group')[:FEED_COUNT]
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Записи пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=(author.username,))
+
+    def items(self, author):
+        return author.posts.select_related('author', 'group')[:FEED_COUNT]
+
+
+class AtomMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj=None):
+        return self._get_dynamic_attr('description', obj)
+
+
+class IndexAtomFeed(AtomMixin, IndexFeed):
+    pass
+
+
+class GroupAtomFeed(AtomMixin, GroupFeed):
+    pass
+
+
+class AuthorAtomFeed(AtomMixin, AuthorFeed):
+    pass
+
+
+def _index(feed):
+    return conditional_feed(
+        lambda: [INDEX], lambda: Post.objects.all()
+    )(cache_feed(lambda: [INDEX])(feed))
+
+
+def _group(feed):
+    return conditional_feed(
+        lambda slug: [group_scope(slug)],
+        lambda slug: Post.objects.filter(group__slug=slug),
+    )(cache_feed(lambda slug: [group_scope(slug)])(feed))
+
+
+def _author(feed):
+    return conditional_feed(
+        lambda username: [author_scope(username)],
+        lambda username: Post.objects.filter(author__username=username),
+    )(cache_feed(lambda username: [author_scope(username)])(feed))
+
+
+index_rss = _index(IndexFeed())
+index_atom = _index(IndexAtomFeed())
+group_rss = _group(GroupFeed())
+group_atom = _group(GroupAtomFeed())
+author_rss = _author(AuthorFeed())
+author_atom = _author(AuthorAtomFeed())
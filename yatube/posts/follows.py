@@ -0,0 +1,76 @@
+"""Подписки пользователя в кеше.
+
+Для каждого пользователя в кеше лежит отсортированный массив id
+авторов, на которых он подписан: так он занимает по 8 байт на
+подписку, а проверка одного автора - двоичный поиск. Подписка и
+отписка меняют массив на месте, без повторного чтения из БД.
+"""
+from array import array
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+
+from .models import Follow
+
+FOLLOWING_KEY = 'follow:following:{}'
+# Две одновременные подписки одного пользователя могут потерять одно
+# изменение; ключ истекает и перечитывается из БД.
+FOLLOWING_CACHE_TIME = 60 * 60 * 24
+
+
+def following_ids(user_id):
+    """Отсортированный массив id авторов, на которых подписан user."""
+    if user_id is None:
+        return array('q')
+    key = FOLLOWING_KEY.format(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = array('q', sorted(Follow.objects.filter(
+            user_id=user_id
+        ).values_list('author_id', flat=True)))
+        cache.set(key, ids, FOLLOWING_CACHE_TIME)
+    return ids
+
+
+def _contains(ids, author_id):
+    index = bisect_left(ids, author_id)
+    return index < len(ids) and ids[index] == author_id
+
+
+def is_following(user_id, author_id):
+    return _contains(following_ids(user_id), author_id)
+
+
+def followed_among(user_id, author_ids):
+    """Те из ``author_ids``, на кого подписан пользователь."""
+    ids = following_ids(user_id)
+    return {
+        author_id for author_id in author_ids if _contains(ids, author_id)
+    }
+
+
+def _update(user_id, change):
+    key = FOLLOWING_KEY.format(user_id)
+    ids = cache.get(key)
+    if ids is not None:
+        change(ids)
+        cache.set(key, ids, FOLLOWING_CACHE_TIME)
+
+
+def add(user_id, author_id):
+    def change(ids):
+        if not _contains(ids, author_id):
+            insort(ids, author_id)
+    _update(user_id, change)
+
+
+def remove(user_id, author_id):
+    def change(ids):
+        if _contains(ids, author_id):
+            ids.remove(author_id)
+    _update(user_id, change)
+
+
+def forget(user_ids):
+    """Сбрасывает массивы после изменений в обход сигналов."""
+    cache.delete_many([FOLLOWING_KEY.format(pk) for pk in user_ids])
@@ -1,6 +1,11 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
 
-from .models import Comment, Post
+from . import images
+from .models import Comment, Group, Post, User
+
+IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
 
 
 class PostForm(forms.ModelForm):
@@ -10,6 +15,21 @@ class PostForm(forms.ModelForm):
         labels = {'text': 'Введите текст', 'group': 'Выберите группу'}
         help_text = {'text': 'Любой текст', 'group': 'Из уже существующих'}
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Уже сохранённую картинку поста повторно не обрабатываем.
+        if not isinstance(image, UploadedFile):
+            return image
+        if image.size > IMAGE_MAX_UPLOAD_SIZE:
+            raise forms.ValidationError('Файл слишком большой')
+        try:
+            return images.ingest_image(image)
+        except (images.ImageTooLarge, Image.DecompressionBombError):
+            raise forms.ValidationError('Слишком большое изображение')
+        except OSError:
+            # Заголовок верный, но данные битые или обрезаны.
+            raise forms.ValidationError('Файл изображения повреждён')
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -17,3 +37,15 @@ class CommentForm(forms.ModelForm):
         fields = ['text']
         labels = {'text': 'Введите текст'}
         help_text = {'text': 'Любой текст'}
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Поиск', max_length=200, required=False)
+    group = forms.ModelChoiceField(
+        Group.objects.all(), label='Группа', required=False,
+        to_field_name='slug',
+    )
+    author = forms.ModelChoiceField(
+        User.objects.all(), label='Автор', required=False,
+        to_field_name='username', widget=forms.TextInput,
+    )
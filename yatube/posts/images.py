@@ -0,0 +1,127 @@
+"""Картинки постов: приём загрузок и миниатюры.
+
+Загрузка пишется во временный файл, проверяется по числу пикселей
+до декодирования, очищается от метаданных, уменьшается до
+``IMAGE_MAX_SIZE`` и пересохраняется в компактном формате.
+Миниатюры всех размеров готовятся фоновой задачей сразу после
+сохранения картинки, их имена записываются в пост. Шаблоны только
+читают готовые миниатюры и до их появления показывают оригинал.
+"""
+import json
+import os
+import tempfile
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+from sorl.thumbnail import get_thumbnail
+
+from . import versions
+from .models import Post
+
+# Больше пикселей не декодируем (с учётом всех кадров анимации).
+IMAGE_MAX_PIXELS = 40_000_000
+# Хранимая картинка не больше этого размера.
+IMAGE_MAX_SIZE = (1920, 1920)
+IMAGE_QUALITY = 85
+# Первая - основная миниатюра, остальные для srcset.
+THUMBNAIL_SIZES = ('960x339', '640x226', '320x113')
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def _output_format(image):
+    if features.check('webp'):
+        return 'WEBP', 'webp'
+    if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+        return 'PNG', 'png'
+    return 'JPEG', 'jpg'
+
+
+def ingest_image(upload):
+    """Готовит загруженную картинку к хранению.
+
+    Возвращает временный файл с уменьшенной картинкой без
+    метаданных. Анимации не пересохраняются, чтобы не потерять кадры.
+    """
+    upload.seek(0)
+    # open() читает только заголовок: размер известен до декодирования.
+    image = Image.open(upload)
+    frames = getattr(image, 'n_frames', 1)
+    if image.width * image.height * frames > IMAGE_MAX_PIXELS:
+        raise ImageTooLarge(image.size)
+    if frames > 1:
+        upload.seek(0)
+        return upload
+    # JPEG умеет декодироваться сразу в уменьшенном масштабе.
+    image.draft('RGB', IMAGE_MAX_SIZE)
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(IMAGE_MAX_SIZE, Image.LANCZOS)
+    if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        image = image.convert(
+            'RGBA' if 'transparency' in image.info else 'RGB'
+        )
+    pil_format, extension = _output_format(image)
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    # Безымянный временный файл удалится сам после сохранения поста.
+    result = File(tempfile.TemporaryFile(), name=f'{stem}.{extension}')
+    # Метаданные (EXIF, ICC, комментарии) не передаём - они не нужны.
+    image.save(
+        result.file, pil_format, quality=IMAGE_QUALITY, optimize=True
+    )
+    result.size = result.tell()
+    result.seek(0)
+    return result
+
+
+def ready_thumbnails(post):
+    """Готовые миниатюры картинки поста: [(url, ширина), ...] или [].
+
+    Пустой список, пока фоновая задача не подготовила миниатюры для
+    текущей картинки. Читает только поле поста, без запросов к БД.
+    """
+    if not post.image or not post.thumbnails:
+        return []
+    ready = json.loads(post.thumbnails)
+    if ready['image'] != post.image.name:
+        # Картинку заменили, миниатюры новой ещё готовятся.
+        return []
+    return [
+        (post.image.storage.url(name), width)
+        for name, width in ready['sizes']
+    ]
+
+
+def generate_thumbnails(post_id):
+    """Готовит все миниатюры картинки поста."""
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id
+    ).first()
+    if post is None or not post.image:
+        return
+    try:
+        if not post.image.storage.exists(post.image.name):
+            return
+    except SuspiciousFileOperation:
+        # Путь вне MEDIA_ROOT: такой файл не читаем.
+        return
+    sizes = [
+        (
+            get_thumbnail(post.image, geometry, **THUMBNAIL_OPTIONS).name,
+            int(geometry.split('x')[0]),
+        )
+        for geometry in THUMBNAIL_SIZES
+    ]
+    # Карточки и страницы с оригиналом вместо миниатюр устарели.
+    # Если картинку успели заменить, её миниатюры запишет своя задача.
+    Post.objects.filter(pk=post_id, image=post.image.name).update(
+        thumbnails=json.dumps({'image': post.image.name, 'sizes': sizes}),
+        updated_at=timezone.now(),
+    )
+    versions.bump(*versions.post_scopes(post))
@@ -0,0 +1,418 @@
+"""Массовый импорт постов, комментариев и подписок.
+
+Записи читаются потоком из JSONL или CSV, по одной строке::
+
+    {"type": "post", "id": "p1", "author": "leo", "group": "cats",
+     "text": "...", "pub_date": "2020-01-01T10:00:00+00:00"}
+    {"type": "comment", "post": "p1", "author": "ann", "text": "..."}
+    {"type": "follow", "user": "ann", "author": "leo"}
+
+Авторы и группы ищутся по username и slug через словари в памяти,
+посты - по внешнему id. Записи вставляются ``bulk_create`` пачками,
+каждая порция записей - в своей транзакции; id выдаёт БД. Даты из
+файла ставятся отдельным UPDATE после вставки: ``bulk_create`` заменяет
+их текущим временем. Сигналы при этом не работают, поэтому счётчики,
+ленты подписок и версии кеша обновляются один раз в конце.
+
+После каждой порции в файл контрольной точки дописывается строка
+с номером последней записи и новыми id. Строка пишется внутри
+транзакции порции, поэтому при повторном запуске импорт продолжается
+с места сбоя: порция, которая не успела зафиксироваться, определяется
+по отсутствию её последних записей в БД. Запись сверяется не только по
+id, но и по автору и тексту: после отката SQLite выдаёт тот же id
+следующему посту сайта.
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+import time
+
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Max, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, follows, timeline, versions
+from .models import Comment, Follow, Group, Post, User
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH = 500
+IMPORT_CHUNK = 5000
+RECORD_TYPES = ('post', 'comment', 'follow')
+
+
+def read_records(path, file_format=None):
+    """Нумерованные записи файла: (номер, словарь), по одной."""
+    file_format = file_format or os.path.splitext(path)[1].lstrip('.')
+    with open(path, encoding='utf-8', newline='') as file:
+        if file_format == 'csv':
+            for number, row in enumerate(csv.DictReader(file), 1):
+                yield number, {
+                    key: value or None for key, value in row.items()
+                }
+        elif file_format in ('jsonl', 'json'):
+            for number, line in enumerate(file, 1):
+                if line.strip():
+                    yield number, json.loads(line)
+        else:
+            raise ValueError(f'Неизвестный формат: {file_format}')
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'Некорректная дата: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def _values(model, ids, field):
+    values = []
+    for batch in counters.id_batches(ids, IMPORT_BATCH):
+        values.extend(model.objects.filter(
+            pk__in=batch
+        ).values_list(field, flat=True))
+    return values
+
+
+def _stamp(obj):
+    """[id, автор, хеш текста] записи для контрольной точки."""
+    if obj is None:
+        return None
+    return [obj.pk, obj.author_id, hashlib.md5(obj.text.encode()).hexdigest()]
+
+
+def _stored(model, stamp):
+    pk, author_id, digest = stamp
+    row = model.objects.filter(pk=pk).values_list(
+        'author_id', 'text'
+    ).first()
+    return row is not None and row[0] == author_id and (
+        hashlib.md5(row[1].encode()).hexdigest() == digest
+    )
+
+
+def _insert(model, objects, batch_size):
+    """``bulk_create``, после которого у объектов есть id из БД."""
+    model.objects.bulk_create(objects, batch_size=batch_size)
+    if not objects or objects[0].pk is not None:
+        # PostgreSQL сам возвращает id вставленных строк.
+        return
+    # SQLite id не возвращает. С первой вставки транзакция держит
+    # блокировку записи, поэтому строки получили id подряд, по порядку
+    # вставки, и последний из них - максимальный в таблице.
+    last = model.objects.aggregate(last=Max('pk'))['last']
+    first = last - len(objects) + 1
+    for pk, instance in enumerate(objects, first):
+        instance.pk = pk
+
+
+def _set_dates(model, dated, batch_size):
+    """Ставит даты из файла: [(объект, дата)]."""
+    dates = {instance.pk: date for instance, date in dated}
+    for batch in counters.id_batches(dates, batch_size):
+        date = Case(
+            *[When(pk=pk, then=Value(dates[pk])) for pk in batch],
+            output_field=DateTimeField(),
+        )
+        model.objects.filter(pk__in=batch).update(
+            pub_date=date, updated_at=date
+        )
+
+
+class Importer:
+    def __init__(self, checkpoint, batch_size=IMPORT_BATCH,
+                 chunk_size=IMPORT_CHUNK, create_missing=False,
+                 log=None):
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.create_missing = create_missing
+        self.log = log or logger.info
+        self.line = 0
+        self.users = {}
+        self.groups = {}
+        self.posts = {}
+        # Что пересчитать и сбросить в конце импорта.
+        self.authors = set()
+        self.touched_groups = set()
+        self.commented = set()
+        self.follows = set()
+        self.stats = dict.fromkeys(
+            ('post', 'comment', 'follow', 'skipped'), 0
+        )
+        # Сколько записей вставлено этим запуском: для скорости.
+        self.imported = 0
+
+    def run(self, records):
+        self.load_checkpoint()
+        started = time.monotonic()
+        chunk = []
+        for number, record in records:
+            if number <= self.line:
+                continue
+            chunk.append((number, record))
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk, started)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk, started)
+        self.finish()
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        return self.stats
+
+    def load_checkpoint(self):
+        if not os.path.exists(self.checkpoint):
+            return
+        with open(self.checkpoint, encoding='utf-8') as file:
+            entries = [json.loads(line) for line in file if line.strip()]
+        if entries and not self._committed(entries[-1]):
+            entries.pop()
+            with open(self.checkpoint, 'w', encoding='utf-8') as file:
+                file.writelines(
+                    json.dumps(entry) + '\n' for entry in entries
+                )
+        for entry in entries:
+            self.line = entry['line']
+            self.posts.update(entry['posts'])
+            self.authors.update(entry['authors'])
+            self.touched_groups.update(entry['groups'])
+            self.commented.update(entry['commented'])
+            self.follows.update(map(tuple, entry['follows']))
+            for kind, count in entry['stats'].items():
+                self.stats[kind] += count
+        if entries:
+            self.log(f'Продолжаем после записи {self.line}')
+
+    @staticmethod
+    def _committed(entry):
+        if entry['last_post']:
+            return _stored(Post, entry['last_post'])
+        if entry['last_comment']:
+            return _stored(Comment, entry['last_comment'])
+        # В порции только новые подписки: уже существовавшие
+        # отбрасываются до вставки.
+        if entry['follows']:
+            user_id, author_id = entry['follows'][-1]
+            return Follow.objects.filter(
+                user_id=user_id, author_id=author_id
+            ).exists()
+        return True
+
+    def resolve(self, chunk):
+        """Загружает в словари авторов и группы порции."""
+        usernames, slugs = set(), set()
+        for _, record in chunk:
+            usernames.update(filter(None, (
+                record.get('author'), record.get('user')
+            )))
+            if record.get('group'):
+                slugs.add(record['group'])
+        usernames -= self.users.keys()
+        slugs -= self.groups.keys()
+        self.users.update(User.objects.filter(
+            username__in=usernames
+        ).values_list('username', 'pk'))
+        self.groups.update(Group.objects.filter(
+            slug__in=slugs
+        ).values_list('slug', 'pk'))
+        if not self.create_missing:
+            return
+        missing = usernames - self.users.keys()
+        if missing:
+            new_users = [User(username=username) for username in missing]
+            for user in new_users:
+                user.set_unusable_password()
+            User.objects.bulk_create(new_users, batch_size=self.batch_size)
+            self.users.update(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'pk'))
+        missing = slugs - self.groups.keys()
+        if missing:
+            Group.objects.bulk_create(
+                [Group(title=slug, slug=slug) for slug in missing],
+                batch_size=self.batch_size,
+            )
+            self.groups.update(Group.objects.filter(
+                slug__in=missing
+            ).values_list('slug', 'pk'))
+
+    def build(self, chunk):
+        """Объекты порции, ещё без id.
+
+        Комментарии к постам этой же порции получают ``post_id`` после
+        вставки постов, по парам (комментарий, пост) из ``links``.
+        """
+        built = {
+            'posts': [], 'comments': [], 'follows': {}, 'new_posts': {},
+            'links': [], 'post_dates': [], 'comment_dates': [],
+        }
+        builders = {
+            'post': self._build_post,
+            'comment': self._build_comment,
+            'follow': self._build_follow,
+        }
+        for _, record in chunk:
+            kind = record.get('type')
+            author_id = self.users.get(record.get('author'))
+            if kind not in RECORD_TYPES or author_id is None or (
+                kind != 'follow' and not record.get('text')
+            ) or not builders[kind](record, author_id, built):
+                self.stats['skipped'] += 1
+        built['follows'] = self.new_follows(built['follows'])
+        return built
+
+    def _build_post(self, record, author_id, built):
+        group_id = self.groups.get(record.get('group'))
+        if record.get('group') and group_id is None:
+            return False
+        post = Post(
+            author_id=author_id, group_id=group_id, text=record['text']
+        )
+        built['posts'].append(post)
+        pub_date = _parse_date(record.get('pub_date'))
+        if pub_date:
+            built['post_dates'].append((post, pub_date))
+        if record.get('id'):
+            built['new_posts'][str(record['id'])] = post
+        return True
+
+    def _build_comment(self, record, author_id, built):
+        post = built['new_posts'].get(str(record.get('post')))
+        post_id = self.posts.get(str(record.get('post')))
+        if post is None and post_id is None:
+            return False
+        comment = Comment(
+            post_id=post_id, author_id=author_id, text=record['text']
+        )
+        built['comments'].append(comment)
+        if post is not None:
+            built['links'].append((comment, post))
+        pub_date = _parse_date(record.get('pub_date'))
+        if pub_date:
+            built['comment_dates'].append((comment, pub_date))
+        return True
+
+    def _build_follow(self, record, author_id, built):
+        user_id = self.users.get(record.get('user'))
+        pair = (user_id, author_id)
+        if user_id is None or user_id == author_id or (
+            pair in built['follows']
+        ):
+            return False
+        built['follows'][pair] = Follow(user_id=user_id, author_id=author_id)
+        return True
+
+    def new_follows(self, follows):
+        """Подписки, которых ещё нет в БД."""
+        for batch in counters.id_batches(
+            {user_id for user_id, _ in follows}, self.batch_size
+        ):
+            for pair in Follow.objects.filter(
+                user_id__in=batch
+            ).values_list('user_id', 'author_id'):
+                if follows.pop(pair, None) is not None:
+                    self.stats['skipped'] += 1
+        return list(follows.values())
+
+    def import_chunk(self, chunk, started):
+        self.resolve(chunk)
+        # Чтение - до транзакции: в ней первым идёт запись.
+        built = self.build(chunk)
+        posts, comments, follows = (
+            built['posts'], built['comments'], built['follows']
+        )
+        with transaction.atomic():
+            _insert(Post, posts, self.batch_size)
+            for comment, post in built['links']:
+                comment.post_id = post.pk
+            _insert(Comment, comments, self.batch_size)
+            Follow.objects.bulk_create(
+                follows, batch_size=self.batch_size, ignore_conflicts=True
+            )
+            _set_dates(Post, built['post_dates'], self.batch_size)
+            _set_dates(Comment, built['comment_dates'], self.batch_size)
+            entry = {
+                'line': chunk[-1][0],
+                'posts': {
+                    post_id: post.pk
+                    for post_id, post in built['new_posts'].items()
+                },
+                'last_post': _stamp(posts[-1] if posts else None),
+                'last_comment': _stamp(comments[-1] if comments else None),
+                'authors': sorted({post.author_id for post in posts}),
+                'groups': sorted({
+                    post.group_id for post in posts if post.group_id
+                }),
+                'commented': sorted({
+                    comment.post_id for comment in comments
+                }),
+                'follows': [
+                    [follow.user_id, follow.author_id] for follow in follows
+                ],
+                'stats': {
+                    'post': len(posts),
+                    'comment': len(comments),
+                    'follow': len(follows),
+                },
+            }
+            # Контрольная точка пишется до фиксации транзакции.
+            with open(self.checkpoint, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(entry) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+        self.line = entry['line']
+        self.posts.update(entry['posts'])
+        self.authors.update(entry['authors'])
+        self.touched_groups.update(entry['groups'])
+        self.commented.update(entry['commented'])
+        self.follows.update(map(tuple, entry['follows']))
+        for kind, count in entry['stats'].items():
+            self.stats[kind] += count
+        imported = sum(entry['stats'].values())
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.imported += imported
+        self.log(
+            f'Записей: {self.line}, постов: {self.stats["post"]}, '
+            f'комментариев: {self.stats["comment"]}, '
+            f'подписок: {self.stats["follow"]}, '
+            f'{self.imported / elapsed:.0f} в секунду'
+        )
+
+    def finish(self):
+        """Отложенная работа: счётчики, ленты подписок и кеш."""
+        follow_users = {user_id for user_id, _ in self.follows}
+        follow_authors = {author_id for _, author_id in self.follows}
+        counters.recount_groups(ids=self.touched_groups)
+        counters.recount_posts(ids=self.commented)
+        counters.recount_users(
+            ids=self.authors | follow_users | follow_authors
+        )
+        follows.forget(follow_users)
+        heavy = timeline.heavy_author_ids()
+        pairs = set(self.follows)
+        for batch in counters.id_batches(
+            self.authors - heavy, self.batch_size
+        ):
+            pairs.update(Follow.objects.filter(
+                author_id__in=batch
+            ).values_list('user_id', 'author_id'))
+        timeline.backfill_timelines(pairs)
+        usernames = _values(
+            User, self.authors | follow_users | follow_authors, 'username'
+        )
+        slugs = _values(Group, self.touched_groups, 'slug')
+        versions.bump(
+            versions.INDEX,
+            *map(versions.author_scope, usernames),
+            *map(versions.group_scope, slugs),
+            *map(versions.following_scope, follow_users),
+            self.touched_groups and versions.GROUPS,
+        )
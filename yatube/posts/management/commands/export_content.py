@@ -0,0 +1,45 @@
+import sys
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exporter
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты, комментарии и подписки автора.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'), default='jsonl'
+        )
+        parser.add_argument(
+            '--zip', action='store_true',
+            help='Zip-архив вместе с картинками постов.'
+        )
+        parser.add_argument(
+            '--output', help='Файл выгрузки (по умолчанию stdout).'
+        )
+
+    def handle(self, *args, username, **options):
+        author = User.objects.filter(username=username).first()
+        if author is None:
+            raise CommandError(f'Пользователь {username} не найден')
+        if options['zip']:
+            if not options['output']:
+                raise CommandError('Для --zip нужен --output')
+            content = exporter.stream_zip(
+                author, default_storage, options['format']
+            )
+        else:
+            content = exporter.stream_export(author, options['format'])
+        if options['output']:
+            with open(options['output'], 'wb') as file:
+                for chunk in content:
+                    file.write(chunk)
+        else:
+            for chunk in content:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.flush()
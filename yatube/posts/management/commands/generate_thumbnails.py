@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import images
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Готовит миниатюры картинок постов, у которых они ещё '
+        'не записаны в пост.'
+    )
+
+    def handle(self, *args, **options):
+        post_ids = Post.objects.exclude(image='').filter(
+            thumbnails=''
+        ).values_list('pk', flat=True)
+        total = 0
+        for post_id in post_ids.iterator():
+            images.generate_thumbnails(post_id)
+            total += 1
+        self.stdout.write(f'Миниатюры подготовлены для постов: {total}')
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = 'Импортирует посты, комментарии и подписки из JSONL или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .jsonl или .csv.')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='Формат файла, если его не видно по расширению.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.IMPORT_BATCH,
+            help='Сколько строк вставлять одним запросом.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=importer.IMPORT_CHUNK,
+            help='Сколько записей импортировать в одной транзакции.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки (по умолчанию <path>.checkpoint).'
+        )
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать неизвестных авторов и группы.'
+        )
+
+    def handle(self, *args, path, **options):
+        worker = importer.Importer(
+            checkpoint=options['checkpoint'] or f'{path}.checkpoint',
+            batch_size=options['batch_size'],
+            chunk_size=options['chunk_size'],
+            create_missing=options['create_missing'],
+            log=self.stdout.write,
+        )
+        try:
+            stats = worker.run(importer.read_records(path, options['format']))
+        except (OSError, ValueError) as error:
+            raise CommandError(
+                f'{error}. Повторный запуск продолжит импорт '
+                'с контрольной точки.'
+            )
+        self.stdout.write(
+            f'Готово: постов {stats["post"]}, '
+            f'комментариев {stats["comment"]}, '
+            f'подписок {stats["follow"]}, пропущено {stats["skipped"]}'
+        )
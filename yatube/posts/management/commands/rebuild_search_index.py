@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает индекс полнотекстового поиска.'
+
+    def handle(self, *args, **options):
+        total = search.rebuild_index()
+        self.stdout.write(f'Проиндексировано постов: {total}')
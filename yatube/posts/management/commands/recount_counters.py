@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=counters.RECOUNT_BATCH,
+            help='Сколько строк пересчитывать в одной транзакции.'
+        )
+
+    def handle(self, *args, batch_size, **options):
+        steps = (
+            ('Группы', counters.recount_groups),
+            ('Посты', counters.recount_posts),
+            ('Пользователи', counters.recount_users),
+        )
+        for title, recount in steps:
+            total = recount(batch_size=batch_size)
+            self.stdout.write(f'{title}: пересчитано {total}')
@@ -0,0 +1,75 @@
+from django.db import migrations
+
+# Индекс поиска есть только в SQLite (FTS5), rowid - id поста.
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE posts_search USING fts5("
+    "text, comments, tokenize = 'unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER posts_search_post_insert AFTER INSERT ON posts_post "
+    "BEGIN "
+    "INSERT INTO posts_search (rowid, text, comments) "
+    "VALUES (new.id, new.text, ''); "
+    "END",
+    "CREATE TRIGGER posts_search_post_update AFTER UPDATE OF text "
+    "ON posts_post BEGIN "
+    "UPDATE posts_search SET text = new.text WHERE rowid = new.id; "
+    "END",
+    "CREATE TRIGGER posts_search_post_delete AFTER DELETE ON posts_post "
+    "BEGIN "
+    "DELETE FROM posts_search WHERE rowid = old.id; "
+    "END",
+]
+COMMENTS_SQL = (
+    "UPDATE posts_search SET comments = coalesce(("
+    "SELECT group_concat(text, ' ') FROM posts_comment "
+    "WHERE post_id = {row}.post_id), '') "
+    "WHERE rowid = {row}.post_id; "
+)
+for event, row in (
+    ('INSERT', 'new'), ('UPDATE OF text', 'new'), ('DELETE', 'old')
+):
+    name = event.split()[0].lower()
+    CREATE_SQL.append(
+        f"CREATE TRIGGER posts_search_comment_{name} AFTER {event} "
+        f"ON posts_comment BEGIN {COMMENTS_SQL.format(row=row)}END"
+    )
+FILL_SQL = (
+    "INSERT INTO posts_search (rowid, text, comments) "
+    "SELECT post.id, post.text, coalesce(("
+    "SELECT group_concat(comment.text, ' ') "
+    "FROM posts_comment AS comment WHERE comment.post_id = post.id"
+    "), '') FROM posts_post AS post"
+)
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS posts_search_post_insert',
+    'DROP TRIGGER IF EXISTS posts_search_post_update',
+    'DROP TRIGGER IF EXISTS posts_search_post_delete',
+    'DROP TRIGGER IF EXISTS posts_search_comment_insert',
+    'DROP TRIGGER IF EXISTS posts_search_comment_update',
+    'DROP TRIGGER IF EXISTS posts_search_comment_delete',
+    'DROP TABLE IF EXISTS posts_search',
+]
+
+
+def create_search(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL + [FILL_SQL]:
+        schema_editor.execute(sql)
+
+
+def drop_search(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search, drop_search),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:53
+from importlib import import_module
+
+from django.db import migrations, models
+
+search = import_module('posts.migrations.0015_search')
+
+# SQLite пересоздаёт таблицу при добавлении поля, и триггеры поиска
+# на posts_post пропадают вместе со старой таблицей.
+POST_TRIGGERS = [sql for sql in search.CREATE_SQL if 'ON posts_post' in sql]
+DROP_TRIGGERS = [sql for sql in search.DROP_SQL if 'search_post_' in sql]
+
+
+def restore_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_TRIGGERS + POST_TRIGGERS:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_comment_post_pub_date_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.AddField(
+            model_name='post',
+            name='views',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Просмотры'),
+        ),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
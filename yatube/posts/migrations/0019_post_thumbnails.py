@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:13
+from importlib import import_module
+
+from django.db import migrations, models
+
+# Триггеры поиска на posts_post пропадают при пересоздании таблицы.
+restore_triggers = import_module(
+    'posts.migrations.0017_post_views'
+).restore_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_group_posts_count_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnails',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Миниатюры'),
+        ),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+from importlib import import_module
+
+from django.db import migrations
+
+search = import_module('posts.migrations.0015_search')
+
+# Комментарии индексируются отдельными строками: rowid - id комментария.
+# Изменение комментария трогает только его строку, а не склейку всех
+# комментариев поста. В posts_search остаётся только текст поста.
+TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2'"
+CREATE_SQL = [
+    f"CREATE VIRTUAL TABLE posts_search USING fts5(text, {TOKENIZE})",
+    "CREATE TRIGGER posts_search_post_insert AFTER INSERT ON posts_post "
+    "BEGIN "
+    "INSERT INTO posts_search (rowid, text) VALUES (new.id, new.text); "
+    "END",
+    "CREATE TRIGGER posts_search_post_update AFTER UPDATE OF text "
+    "ON posts_post BEGIN "
+    "UPDATE posts_search SET text = new.text WHERE rowid = new.id; "
+    "END",
+    "CREATE TRIGGER posts_search_post_delete AFTER DELETE ON posts_post "
+    "BEGIN "
+    "DELETE FROM posts_search WHERE rowid = old.id; "
+    "END",
+    "CREATE VIRTUAL TABLE posts_search_comments USING fts5("
+    f"text, post_id UNINDEXED, {TOKENIZE})",
+    "CREATE TRIGGER posts_search_comment_insert AFTER INSERT "
+    "ON posts_comment BEGIN "
+    "INSERT INTO posts_search_comments (rowid, text, post_id) "
+    "VALUES (new.id, new.text, new.post_id); "
+    "END",
+    "CREATE TRIGGER posts_search_comment_update AFTER UPDATE OF text "
+    "ON posts_comment BEGIN "
+    "UPDATE posts_search_comments SET text = new.text "
+    "WHERE rowid = new.id; "
+    "END",
+    "CREATE TRIGGER posts_search_comment_delete AFTER DELETE "
+    "ON posts_comment BEGIN "
+    "DELETE FROM posts_search_comments WHERE rowid = old.id; "
+    "END",
+]
+FILL_SQL = [
+    "INSERT INTO posts_search (rowid, text) SELECT id, text FROM posts_post",
+    "INSERT INTO posts_search_comments (rowid, text, post_id) "
+    "SELECT id, text, post_id FROM posts_comment",
+]
+DROP_SQL = search.DROP_SQL + [
+    'DROP TABLE IF EXISTS posts_search_comments',
+]
+
+
+def create_search(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL + CREATE_SQL + FILL_SQL:
+        schema_editor.execute(sql)
+
+
+def restore_search(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+    search.create_search(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_thumbnails'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search, restore_search),
+    ]
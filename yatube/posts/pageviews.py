@@ -0,0 +1,128 @@
+"""Счётчик просмотров постов с буфером в памяти процесса.
+
+Просмотр не пишет в БД сразу: ``record_view`` увеличивает счётчик
+в памяти процесса. Накопленное записывается одним UPDATE с F() на пачку
+постов, когда набралось ``VIEWS_FLUSH_HITS`` просмотров или прошло
+``VIEWS_FLUSH_INTERVAL`` секунд с прошлой записи, а также при
+остановке процесса. При ``VIEWS_BUFFERED = False`` (разработка
+и тесты) каждый просмотр записывается сразу.
+
+Потери ограничены: если процесс упадёт, не дойдя до ``atexit``,
+пропадут его незаписанные просмотры - не больше ``VIEWS_FLUSH_HITS``
+и не старше ``VIEWS_FLUSH_INTERVAL`` секунд, если к процессу
+приходили запросы. Время каждой записи отдаёт ``flush_stats``.
+
+Запись меняет версию просмотров (``versions.VIEWS``), от которой
+зависят кеш и ETag лент с карточками постов.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from django.db.models import Case, F, IntegerField, Value, When
+
+from core import tasks
+
+from . import versions
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+VIEWS_FLUSH_HITS = 500
+VIEWS_FLUSH_INTERVAL = 5
+VIEWS_FLUSH_BATCH = 500
+
+_pending = Counter()
+_hits = 0
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+_stats = {'flushes': 0, 'posts': 0, 'last_ms': 0.0, 'max_ms': 0.0}
+
+
+def record_view(post_id):
+    """Засчитывает просмотр; пора - отдаёт буфер на запись.
+
+    Возвращает, сколько просмотров поста, включая этот, ещё нет
+    в строке, прочитанной из БД до вызова.
+    """
+    global _hits, _last_flush
+    if not settings.VIEWS_BUFFERED:
+        write_views({post_id: 1})
+        return 1
+    with _lock:
+        _pending[post_id] += 1
+        _hits += 1
+        now = time.monotonic()
+        if (
+            _hits < VIEWS_FLUSH_HITS
+            and now - _last_flush < VIEWS_FLUSH_INTERVAL
+        ):
+            return _pending[post_id]
+        views = dict(_pending)
+        _pending.clear()
+        _hits = 0
+        _last_flush = now
+    tasks.submit(write_views, views)
+    return views[post_id]
+
+
+def pending(post_id):
+    """Просмотры поста, ещё не записанные в БД этим процессом."""
+    with _lock:
+        return _pending[post_id]
+
+
+def write_views(views):
+    """Прибавляет просмотры {post_id: число} к постам пачками."""
+    started = time.perf_counter()
+    ids = sorted(views)
+    for start in range(0, len(ids), VIEWS_FLUSH_BATCH):
+        batch = ids[start:start + VIEWS_FLUSH_BATCH]
+        # Напрямую в основную БД: запись не переключает запрос
+        # на неё (core.db).
+        Post.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=batch).update(
+            views=F('views') + Case(
+                *[When(pk=pk, then=Value(views[pk])) for pk in batch],
+                output_field=IntegerField(),
+            )
+        )
+    versions.bump_views()
+    duration = (time.perf_counter() - started) * 1000
+    with _lock:
+        _stats['flushes'] += 1
+        _stats['posts'] += len(ids)
+        _stats['last_ms'] = duration
+        _stats['max_ms'] = max(_stats['max_ms'], duration)
+    logger.info('Просмотры %d постов записаны за %.1f мс', len(ids), duration)
+
+
+def flush():
+    """Записывает весь буфер сразу."""
+    global _hits, _last_flush
+    with _lock:
+        views = dict(_pending)
+        _pending.clear()
+        _hits = 0
+        _last_flush = time.monotonic()
+    if views:
+        write_views(views)
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except DatabaseError:
+        logger.exception('Просмотры не записаны при остановке')
+
+
+def flush_stats():
+    """Число записей буфера и их длительность в мс."""
+    with _lock:
+        return dict(_stats)
+
+
+atexit.register(_flush_at_exit)
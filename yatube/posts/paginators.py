@@ -0,0 +1,147 @@
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+# Сколько первых страниц доступно по номеру (?page=N).
+# Дальше лента листается только курсорами ?after= / ?before=.
+SHALLOW_PAGES = 5
+CURSOR_KEYS = ('pub_date', 'pk')
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPage(Page):
+    """Страница, найденная по курсору: без номера и без COUNT(*)."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = None
+        self.previous_cursor = None
+        if has_next and object_list:
+            self.next_cursor = paginator.cursor_for(object_list[-1])
+        if has_previous and object_list:
+            self.previous_cursor = paginator.cursor_for(object_list[0])
+
+    def __repr__(self):
+        return '<Page by cursor>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+
+class CursorPaginator(Paginator):
+    """Paginator, который умеет искать страницы по ключу.
+
+    Записи упорядочены по убыванию полей ``keys``: последнее поле
+    должно быть уникальным, чтобы у каждой записи была своя позиция.
+    Первые ``SHALLOW_PAGES`` страниц по-прежнему доступны по номеру,
+    а глубже лента листается без OFFSET и без подсчёта записей.
+    ``count`` не больше числа записей на этих страницах плюс одной.
+    """
+
+    def __init__(self, object_list, per_page, keys=CURSOR_KEYS, **kwargs):
+        self.keys = tuple(keys)
+        object_list = object_list.order_by(
+            *(f'-{key}' for key in self.keys)
+        )
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        """Записи считаются только до конца страниц с номерами."""
+        limit = SHALLOW_PAGES * self.per_page + 1
+        return self.object_list[:limit].count()
+
+    @property
+    def page_range(self):
+        return range(1, min(self.num_pages, SHALLOW_PAGES) + 1)
+
+    def page(self, number):
+        page = super().page(number)
+        page.object_list = list(page.object_list)
+        page.next_cursor = None
+        if page.number >= SHALLOW_PAGES and page.has_next():
+            page.next_cursor = self.cursor_for(page.object_list[-1])
+        return page
+
+    def shallow_end_cursor(self):
+        """Курсор за последней страницей с номером или None."""
+        last = SHALLOW_PAGES * self.per_page - 1
+        rows = list(self.object_list[last:last + 1])
+        return self.cursor_for(rows[0]) if rows else None
+
+    def first_page(self):
+        """Первая страница без COUNT(*): для лент без номеров страниц."""
+        rows = list(self.object_list[:self.per_page + 1])
+        return CursorPage(
+            rows[:self.per_page], self, len(rows) > self.per_page, False
+        )
+
+    def cursor_for(self, obj):
+        values = [
+            self._field(key).value_to_string(obj)
+            if key != 'pk' else str(obj.pk)
+            for key in self.keys
+        ]
+        return urlsafe_base64_encode(json.dumps(values).encode())
+
+    def decode_cursor(self, token):
+        try:
+            values = json.loads(urlsafe_base64_decode(token).decode())
+        except (binascii.Error, ValueError):
+            raise InvalidCursor('Некорректный курсор')
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise InvalidCursor('Некорректный курсор')
+        try:
+            return [
+                self._field(key).to_python(value)
+                for key, value in zip(self.keys, values)
+            ]
+        except ValidationError:
+            raise InvalidCursor('Некорректный курсор')
+
+    def cursor_page(self, after=None, before=None):
+        """Страница записей старше курсора ``after`` или новее ``before``."""
+        token = after or before
+        values = self.decode_cursor(token)
+        lookup = 'lt' if after else 'gt'
+        condition = Q()
+        for position, key in enumerate(self.keys):
+            step = Q(**{f'{key}__{lookup}': values[position]})
+            for previous, value in zip(self.keys[:position], values):
+                step &= Q(**{previous: value})
+            condition |= step
+        queryset = self.object_list.filter(condition)
+        if before:
+            queryset = queryset.reverse()
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if after:
+            return CursorPage(rows, self, has_more, True)
+        if not has_more:
+            # Дошли до начала ленты - показываем обычную первую страницу.
+            return self.page(1)
+        return CursorPage(rows[::-1], self, True, True)
+
+    def get_cursor_page(self, after=None, before=None):
+        try:
+            return self.cursor_page(after=after, before=before)
+        except InvalidCursor:
+            return self.get_page(1)
+
+    def _field(self, key):
+        meta = self.object_list.model._meta
+        return meta.pk if key == 'pk' else meta.get_field(key)
@@ -0,0 +1,137 @@
+"""Полнотекстовый поиск по постам и комментариям (SQLite FTS5).
+
+Таблица ``posts_search`` хранит тексты постов (rowid - id поста),
+``posts_search_comments`` - тексты комментариев (rowid - id
+комментария) с id их поста. Пост находится, если запросу отвечает его
+текст или один из комментариев. Триггеры из миграции 0020_search_comments
+поддерживают таблицы в актуальном состоянии, а ``rebuild_search_index``
+пересобирает их целиком.
+"""
+import binascii
+import json
+import re
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import Post
+
+SEARCH_TABLE = 'posts_search'
+COMMENTS_TABLE = 'posts_search_comments'
+# Вес совпадений в тексте поста и в комментариях для bm25.
+TEXT_WEIGHT = 1.0
+COMMENTS_WEIGHT = 0.5
+
+REBUILD_SQL = [
+    f'DELETE FROM {SEARCH_TABLE}',
+    f'DELETE FROM {COMMENTS_TABLE}',
+    f'INSERT INTO {SEARCH_TABLE} (rowid, text) '
+    'SELECT id, text FROM posts_post',
+    f'INSERT INTO {COMMENTS_TABLE} (rowid, text, post_id) '
+    'SELECT id, text, post_id FROM posts_comment',
+    f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')",
+    f"INSERT INTO {COMMENTS_TABLE} ({COMMENTS_TABLE}) VALUES ('optimize')",
+]
+# Совпадения в постах и комментариях: (id поста, вес совпадения).
+HITS_SQL = (
+    f'SELECT rowid AS post_id, %s * bm25({SEARCH_TABLE}) AS score '
+    f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+    f'UNION ALL '
+    f'SELECT post_id, %s * bm25({COMMENTS_TABLE}) '
+    f'FROM {COMMENTS_TABLE} WHERE {COMMENTS_TABLE} MATCH %s'
+)
+
+
+def match_expression(query):
+    """Запрос пользователя в синтаксисе FTS5: все слова обязательны.
+
+    Слова берутся в кавычки, поэтому операторы FTS5 из запроса
+    не выполняются и не ломают его.
+    """
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', query))
+
+
+def matching_ids(query):
+    """Подзапрос id постов, найденных по ``query``."""
+    expression = match_expression(query)
+    return RawSQL(
+        f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+        f'UNION SELECT post_id FROM {COMMENTS_TABLE} '
+        f'WHERE {COMMENTS_TABLE} MATCH %s',
+        [expression, expression],
+    )
+
+
+def encode_cursor(rank, post_id):
+    return urlsafe_base64_encode(json.dumps([rank, post_id]).encode())
+
+
+def decode_cursor(token):
+    """(rank, id поста) из курсора или None, если он некорректен."""
+    try:
+        rank, post_id = json.loads(urlsafe_base64_decode(token).decode())
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if not isinstance(rank, (int, float)) or not isinstance(post_id, int):
+        return None
+    return rank, post_id
+
+
+def search_posts(query, limit, group=None, author=None, after=None):
+    """Посты по убыванию релевантности (bm25) и курсор следующей страницы.
+
+    ``after`` - курсор последнего поста предыдущей страницы.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return [], None
+    sql = [
+        'SELECT hit.post_id, min(hit.score) AS score '
+        f'FROM ({HITS_SQL}) AS hit '
+        'JOIN posts_post AS post ON post.id = hit.post_id'
+    ]
+    params = [TEXT_WEIGHT, expression, COMMENTS_WEIGHT, expression]
+    conditions = []
+    if group is not None:
+        conditions.append('post.group_id = %s')
+        params.append(group.pk)
+    if author is not None:
+        conditions.append('post.author_id = %s')
+        params.append(author.pk)
+    if conditions:
+        sql.append('WHERE ' + ' AND '.join(conditions))
+    # Вес поста - лучшее из совпадений в тексте и в комментариях.
+    sql.append('GROUP BY hit.post_id')
+    cursor = after and decode_cursor(after)
+    if cursor:
+        sql.append(
+            'HAVING min(hit.score) > %s '
+            'OR (min(hit.score) = %s AND hit.post_id > %s)'
+        )
+        params.extend([cursor[0], cursor[0], cursor[1]])
+    # У bm25 чем меньше значение, тем выше релевантность.
+    sql.append('ORDER BY score, hit.post_id LIMIT %s')
+    params.append(limit + 1)
+    with connection.cursor() as db:
+        db.execute(' '.join(sql), params)
+        rows = db.fetchall()
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [post_id for post_id, _ in rows]
+    )
+    found = [posts[post_id] for post_id, _ in rows if post_id in posts]
+    next_cursor = None
+    if has_next:
+        post_id, score = rows[-1]
+        next_cursor = encode_cursor(score, post_id)
+    return found, next_cursor
+
+
+def rebuild_index():
+    """Пересобирает индекс по всем постам и комментариям."""
+    with transaction.atomic(), connection.cursor() as db:
+        for sql in REBUILD_SQL:
+            db.execute(sql)
+    return Post.objects.count()
@@ -0,0 +1,157 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import tasks
+
+from . import counters, follows, images, timeline, versions
+from .models import Comment, Follow, Group, Post, User, UserCounter
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, raw=False, **kwargs):
+    instance._previous_username = None
+    if instance.pk and not raw:
+        instance._previous_username = User.objects.filter(
+            pk=instance.pk
+        ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False,
+               update_fields=None, **kwargs):
+    if raw:
+        return
+    if created:
+        UserCounter.objects.get_or_create(user=instance)
+    # Вход пользователя меняет только last_login - ленты не меняются.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    slugs = Group.objects.filter(
+        posts__author=instance
+    ).distinct().values_list('slug', flat=True)
+    versions.bump(
+        versions.INDEX,
+        versions.author_scope(instance.username),
+        versions.author_scope(getattr(instance, '_previous_username', None)),
+        *(versions.group_scope(slug) for slug in slugs),
+    )
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, raw=False, **kwargs):
+    instance._previous_slug = None
+    if instance.pk and not raw:
+        instance._previous_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versions.bump(
+            versions.INDEX,
+            versions.GROUPS,
+            versions.group_scope(instance.slug),
+            versions.group_scope(instance._previous_slug),
+        )
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    versions.bump(
+        versions.INDEX, versions.GROUPS, versions.group_scope(instance.slug)
+    )
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_post(sender, instance, raw=False, **kwargs):
+    instance._previous = {}
+    if instance.pk and not raw:
+        instance._previous = Post.objects.filter(pk=instance.pk).values(
+            'group_id', 'group__slug', 'image'
+        ).first() or {}
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = instance._previous
+    previous_group_id = previous.get('group_id')
+    previous_slug = previous.get('group__slug')
+    if created:
+        counters.change_user(instance.author_id, posts_count=1)
+        counters.change_group(instance.group_id, 1)
+        tasks.submit(timeline.fanout_post, instance.pk)
+    elif previous_group_id != instance.group_id:
+        counters.change_group(previous_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+    if instance.image and instance.image.name != previous.get('image'):
+        tasks.submit(images.generate_thumbnails, instance.pk)
+    versions.bump(
+        *versions.post_scopes(instance),
+        previous_slug and versions.group_scope(previous_slug),
+        previous_group_id != instance.group_id and versions.GROUPS,
+    )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, posts_count=-1)
+    counters.change_group(instance.group_id, -1)
+    versions.bump(
+        *versions.post_scopes(instance),
+        instance.group_id is not None and versions.GROUPS,
+    )
+
+
+def comment_scopes(comment):
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=comment.post_id
+    ).first()
+    return versions.post_scopes(post) if post else []
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_post(instance.post_id, 1)
+    versions.bump(*comment_scopes(instance))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+    versions.bump(*comment_scopes(instance))
+
+
+def follow_scopes(follow):
+    usernames = User.objects.filter(
+        pk__in=(follow.user_id, follow.author_id)
+    ).values_list('username', flat=True)
+    return [
+        versions.following_scope(follow.user_id),
+        *map(versions.author_scope, usernames),
+    ]
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, followers_count=1)
+        counters.change_user(instance.user_id, following_count=1)
+        follows.add(instance.user_id, instance.author_id)
+        timeline.backfill_timeline(instance.user_id, instance.author_id)
+        versions.bump(*follow_scopes(instance))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, followers_count=-1)
+    counters.change_user(instance.user_id, following_count=-1)
+    follows.remove(instance.user_id, instance.author_id)
+    timeline.prune_timeline(instance.user_id, instance.author_id)
+    versions.bump(*follow_scopes(instance))
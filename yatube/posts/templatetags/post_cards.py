@@ -0,0 +1,77 @@
+import hashlib
+
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from posts import follows
+
+register = template.Library()
+
+CARD_TEMPLATE = 'includes/post_list.html'
+CARD_CACHE_TIME = 60 * 60 * 24
+
+
+def card_key(post):
+    """Ключ карточки меняется вместе со всем, что в ней показано."""
+    stamp = '|'.join(map(str, (
+        post.updated_at.timestamp(),
+        post.comments_count,
+        post.author.username,
+        post.group.slug if post.group_id else '',
+    )))
+    return f'post_card:{post.pk}:{hashlib.md5(stamp.encode()).hexdigest()}'
+
+
+def views_mark(post):
+    """Просмотры меняются на каждой записи буфера, поэтому они вне кеша."""
+    return format_html('<span>Просмотров: {}</span>', post.views)
+
+
+def follow_mark(post, followed):
+    """Подписка на автора карточки: своя у каждого пользователя."""
+    if post.author_id in followed:
+        return mark_safe(
+            '<span class="badge bg-secondary">Вы подписаны</span>'
+        )
+    return format_html(
+        '<a class="btn btn-sm btn-primary" href="{}">Подписаться</a>',
+        reverse('posts:profile_follow', args=(post.author.username,)),
+    )
+
+
+@register.simple_tag
+def post_cards(posts, user=None):
+    """Отрисованные карточки постов: из кеша одним get_many.
+
+    Число просмотров добавляется к карточке после кеша. Для ``user``
+    к карточкам чужих постов добавляется отметка подписки; подписки
+    на всех авторов страницы проверяются разом.
+    """
+    cards = {card_key(post): post for post in posts}
+    rendered = cache.get_many(cards)
+    missing = {
+        key: render_to_string(CARD_TEMPLATE, {'post': post})
+        for key, post in cards.items()
+        if key not in rendered
+    }
+    if missing:
+        cache.set_many(missing, CARD_CACHE_TIME)
+        rendered.update(missing)
+    cards = [
+        (post, mark_safe(rendered[key] + views_mark(post)))
+        for key, post in cards.items()
+    ]
+    if user is None or not user.is_authenticated:
+        return [card for _, card in cards]
+    followed = follows.followed_among(
+        user.pk, {post.author_id for post, _ in cards}
+    )
+    return [
+        card if post.author_id == user.pk
+        else card + follow_mark(post, followed)
+        for post, card in cards
+    ]
@@ -0,0 +1,11 @@
+from django import template
+
+from ..images import ready_thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnails(post):
+    """Готовые миниатюры картинки поста для srcset."""
+    return ready_thumbnails(post)
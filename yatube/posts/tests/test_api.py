@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..api import API_PAGE_SIZE
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(API_PAGE_SIZE + 3)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.user, text='Комментарий'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds(self):
+        """ленты отдаются в JSON страницами по курсору"""
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group', args=(self.group.slug,)),
+            reverse('posts:api_profile', args=(self.user.username,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(len(data['results']), API_PAGE_SIZE)
+                self.assertEqual(
+                    data['results'][0]['text'], self.posts[-1].text
+                )
+                data = self.client.get(url, {'after': data['next']}).json()
+                self.assertEqual(len(data['results']), 3)
+                self.assertIsNone(data['next'])
+                self.assertIsNotNone(data['previous'])
+
+    def test_fields(self):
+        """поля выбираются параметром fields"""
+        url = reverse('posts:api_index')
+        data = self.client.get(url, {'fields': 'id,author'}).json()
+        self.assertEqual(
+            data['results'][0],
+            {'id': self.posts[-1].pk, 'author': self.user.username},
+        )
+        response = self.client.get(url, {'fields': 'password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_detail(self):
+        """пост отдаётся вместе со страницей комментариев"""
+        url = reverse('posts:api_post_detail', args=(self.posts[0].pk,))
+        data = self.client.get(url, {'comment_fields': 'text'}).json()
+        self.assertEqual(data['comments_count'], 1)
+        self.assertEqual(
+            data['comments']['results'], [{'text': 'Комментарий'}]
+        )
+        response = self.client.get(
+            reverse('posts:api_post_detail', args=(0,))
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_not_modified(self):
+        """неизменённая лента отдаёт 304 без загрузки постов"""
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.user, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
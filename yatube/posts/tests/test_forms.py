@@ -1,12 +1,15 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from ..images import IMAGE_MAX_SIZE, THUMBNAIL_SIZES, ready_thumbnails
 from ..models import Comment, Group, Post
 
 User = get_user_model()
@@ -85,6 +88,60 @@ class PostFormsTests(TestCase):
             ).exists()
         )
 
+    def test_create_post_image_ingested(self):
+        """Загруженная картинка уменьшается и теряет метаданные"""
+        source = Image.new('RGB', (4000, 3000), 'red')
+        exif = source.getexif()
+        exif[0x0110] = 'Camera'
+        content = BytesIO()
+        source.save(content, 'JPEG', exif=exif)
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с большой картинкой',
+                'image': SimpleUploadedFile(
+                    'big.jpg', content.getvalue(), 'image/jpeg'
+                ),
+            },
+        )
+        post = Post.objects.get(text='Пост с большой картинкой')
+        with Image.open(post.image) as stored:
+            self.assertLessEqual(stored.width, IMAGE_MAX_SIZE[0])
+            self.assertLessEqual(stored.height, IMAGE_MAX_SIZE[1])
+            self.assertEqual(dict(stored.getexif()), {})
+
+    def test_create_post_truncated_image(self):
+        """обрезанная картинка не проходит форму"""
+        content = BytesIO()
+        Image.effect_noise((800, 600), 64).save(content, 'JPEG')
+        data = content.getvalue()
+        post_count = Post.objects.count()
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с обрезанной картинкой',
+                'image': SimpleUploadedFile(
+                    'broken.jpg', data[:len(data) // 2], 'image/jpeg'
+                ),
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(
+            response, 'form', 'image', 'Файл изображения повреждён'
+        )
+        self.assertEqual(Post.objects.count(), post_count)
+
+    def test_thumbnails_generated_on_upload(self):
+        """Миниатюры картинки готовятся при сохранении поста"""
+        self.post.refresh_from_db()
+        thumbnails = ready_thumbnails(self.post)
+        self.assertEqual(len(thumbnails), len(THUMBNAIL_SIZES))
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        self.assertContains(response, 'srcset=')
+        self.assertContains(response, thumbnails[0][0])
+
     def test_post_edit(self):
         """при отправке валидной формы со страницы
         редактирования поста происходит изменение поста
@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..importer import Importer
+from ..models import Comment, Follow, Group, Post, Timeline
+
+User = get_user_model()
+
+RECORDS = [
+    {'type': 'post', 'id': 'p1', 'author': 'leo', 'group': 'cats',
+     'text': 'Первый пост', 'pub_date': '2020-01-01T10:00:00+00:00'},
+    {'type': 'post', 'id': 'p2', 'author': 'leo', 'text': 'Второй пост'},
+    {'type': 'comment', 'post': 'p1', 'author': 'ann', 'text': 'Ура'},
+    {'type': 'follow', 'user': 'ann', 'author': 'leo'},
+    {'type': 'comment', 'post': 'нет', 'author': 'ann', 'text': 'Мимо'},
+    {'type': 'post', 'id': 'p3', 'author': 'ann', 'text': 'Третий пост'},
+]
+
+
+class ImportContentTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'content.jsonl')
+        with open(self.path, 'w', encoding='utf-8') as file:
+            for record in RECORDS:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.leo = User.objects.create_user(username='leo')
+        Group.objects.create(title='Коты', slug='cats', description='')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def import_content(self, chunk_size=2, *args):
+        call_command(
+            'import_content', self.path, f'--chunk-size={chunk_size}',
+            '--create-missing', *args, stdout=StringIO(),
+        )
+
+    def test_import(self):
+        """записи импортируются с датами, счётчиками и лентами"""
+        self.import_content()
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(Comment.objects.count(), 1)
+        post = Post.objects.get(text='Первый пост')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.group.posts_count, 1)
+        self.leo.refresh_from_db()
+        self.assertEqual(self.leo.counters.posts_count, 2)
+        ann = User.objects.get(username='ann')
+        self.assertTrue(Follow.objects.filter(user=ann, author=self.leo))
+        self.assertEqual(
+            Timeline.objects.filter(user=ann).count(), 2
+        )
+        self.assertFalse(os.path.exists(self.path + '.checkpoint'))
+
+    def test_ids_from_database(self):
+        """id выдаёт БД, комментарий находит пост из той же порции"""
+        Post.objects.create(text='Уже был', author=self.leo)
+        self.import_content(chunk_size=10)
+        post = Post.objects.get(text='Первый пост')
+        self.assertEqual(post.comments.get().text, 'Ура')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.updated_at, post.pub_date)
+        self.assertGreater(
+            Post.objects.get(text='Второй пост').pub_date.year, 2020
+        )
+
+    def test_resume_after_crash(self):
+        """после сбоя импорт продолжается без дублей"""
+        import_chunk = Importer.import_chunk
+        calls = []
+
+        def crash_on_second(importer, chunk, started):
+            calls.append(chunk)
+            if len(calls) == 2:
+                raise OSError('Сбой')
+            return import_chunk(importer, chunk, started)
+
+        with mock.patch.object(Importer, 'import_chunk', crash_on_second):
+            with self.assertRaises(CommandError):
+                self.import_content()
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertTrue(os.path.exists(self.path + '.checkpoint'))
+        self.import_content()
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_resume_after_rollback(self):
+        """порция, откатившаяся после записи контрольной точки, повторяется"""
+        ann = User.objects.create_user(username='ann')
+        bob = User.objects.create_user(username='bob')
+        Follow.objects.create(user=ann, author=self.leo)
+        with open(self.path, 'w', encoding='utf-8') as file:
+            for author in ('bob', 'leo'):
+                file.write(json.dumps(
+                    {'type': 'follow', 'user': 'ann', 'author': author}
+                ) + '\n')
+        # Сбой после записи контрольной точки, до фиксации транзакции.
+        with mock.patch(
+            'posts.importer.os.fsync', side_effect=OSError('Сбой')
+        ):
+            with self.assertRaises(CommandError):
+                self.import_content()
+        self.assertFalse(Follow.objects.filter(user=ann, author=bob))
+        with open(self.path + '.checkpoint', encoding='utf-8') as file:
+            self.assertEqual(len(file.readlines()), 1)
+        self.import_content()
+        self.assertTrue(Follow.objects.filter(user=ann, author=bob))
+
+    def test_resume_after_rollback_id_reused(self):
+        """id откатившегося поста, занятый постом сайта, не сбивает импорт"""
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps(RECORDS[1], ensure_ascii=False) + '\n')
+        with mock.patch(
+            'posts.importer.os.fsync', side_effect=OSError('Сбой')
+        ):
+            with self.assertRaises(CommandError):
+                self.import_content()
+        # Пост сайта получает id, освободившийся после отката.
+        Post.objects.create(text='С сайта', author=self.leo)
+        self.import_content()
+        self.assertTrue(Post.objects.filter(text='Второй пост'))
+
+    def test_finish_in_batches(self):
+        """ленты подписчиков импортированных авторов заполняются пачками"""
+        zoe = User.objects.create_user(username='zoe')
+        Follow.objects.create(user=zoe, author=self.leo)
+        self.import_content(10, '--batch-size=1')
+        self.assertEqual(
+            set(Timeline.objects.filter(user=zoe).values_list(
+                'post__text', flat=True
+            )),
+            {'Первый пост', 'Второй пост'},
+        )
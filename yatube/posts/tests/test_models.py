@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import POSTS_COUNT, Group, Post
+from ..models import POSTS_COUNT, Comment, Follow, Group, Post, UserCounter
 
 User = get_user_model()
 
@@ -58,3 +61,52 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     test_post._meta.get_field(value).help_text, expected)
+
+
+class CounterModelTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+
+    def counters(self, user):
+        return UserCounter.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении записей."""
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(self.counters(self.user).posts_count, 1)
+        self.assertEqual(self.counters(self.user).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        follow.delete()
+        post.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.counters(self.user).posts_count, 0)
+        self.assertEqual(self.counters(self.user).followers_count, 0)
+
+    def test_recount_counters_repairs_drift(self):
+        """recount_counters исправляет счётчики после массовых операций."""
+        Post.objects.bulk_create([
+            Post(author=self.user, text='Тестовый пост', group=self.group)
+            for _ in range(3)
+        ])
+        UserCounter.objects.filter(user=self.reader).delete()
+        call_command('recount_counters', batch_size=2, stdout=StringIO())
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 3)
+        self.assertEqual(self.counters(self.user).posts_count, 3)
+        self.assertEqual(self.counters(self.reader).posts_count, 0)
@@ -1,16 +1,30 @@
+import json
 import shutil
 import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Comment, Follow, Group, Post
-from ..views import POST_COUNT
+from core import db
+from core.queries import (QueryBudgetMixin, QueryRecorder,
+                          reset_view_stats, view_stats)
+
+from .. import follows, pageviews, timeline, versions, views
+from ..models import Comment, Follow, Group, Post, Timeline
+from ..paginators import SHALLOW_PAGES, CursorPage, CursorPaginator
+from ..templatetags.post_cards import card_key, post_cards
+from ..views import COMMENT_COUNT, POST_COUNT
 
 User = get_user_model()
 
@@ -207,26 +221,106 @@ class PostViewsTests(TestCase):
             if comment == self.comment:
                 self.assertEqual(comment, self.comment)
 
+    def test_post_detail_comments_paginated(self):
+        """комментарии выводятся страницами за постоянное число запросов"""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.authorized_client.get(url)
+        with CaptureQueriesContext(connection) as short_thread:
+            self.authorized_client.get(url)
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user_2, text=f'№ {number}')
+            for number in range(COMMENT_COUNT * 2)
+        ])
+        with CaptureQueriesContext(connection) as long_thread:
+            response = self.authorized_client.get(url)
+        self.assertEqual(len(long_thread), len(short_thread))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENT_COUNT)
+        seen = set(comments)
+        while comments.has_next():
+            response = self.authorized_client.get(
+                url, {'after': comments.next_cursor}
+            )
+            comments = response.context['comments']
+            seen.update(comments)
+        self.assertEqual(len(seen), self.post.comments.count())
+
     def test_cache(self):
-        """проверка кеширования главной страницы"""
+        """главная страница берётся из кеша, пока лента не изменилась"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertIsNotNone(response.context)
+        response_2 = self.client.get(reverse('posts:index'))
+        self.assertIsNone(response_2.context)
+        self.assertEqual(response.content, response_2.content)
         new_post = Post.objects.create(
             group=self.group,
             author=self.user,
-            text=self.post.text
-        )
-        response = self.client.get(
-            reverse('posts:index')
+            text='Новый тестовый пост'
         )
+        response_3 = self.client.get(reverse('posts:index'))
+        self.assertIn(new_post, response_3.context['page_obj'])
         new_post.delete()
-        response_2 = self.client.get(
-            reverse('posts:index')
+        response_4 = self.client.get(reverse('posts:index'))
+        self.assertNotIn(new_post, response_4.context['page_obj'])
+
+    def test_feed_not_modified(self):
+        """неизменённая лента отдаёт 304 по ETag и Last-Modified"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
         )
-        self.assertEqual(response.content, response_2.content)
-        cache.clear()
-        response_3 = self.client.get(
-            reverse('posts:index')
+        etags = {}
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('Cookie', response['Vary'])
+                etag = etags[url] = response['ETag']
+                self.assertEqual(self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                ).status_code, 304)
+                self.assertEqual(self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                ).status_code, 304)
+                user_response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(user_response.status_code, 200)
+                self.assertFalse(user_response.has_header('Last-Modified'))
+        Post.objects.create(
+            group=self.group, author=self.user, text='Новый тестовый пост'
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                ).status_code, 200)
+
+    def test_feed_cache_invalidated_by_comment(self):
+        """новый комментарий сбрасывает кеш лент поста"""
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
         )
-        self.assertNotEqual(response.content, response_3.content)
+        for url in urls:
+            self.client.get(url)
+        Comment.objects.create(
+            text='Ещё комментарий', post=self.post, author=self.user_2
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertIsNotNone(self.client.get(url).context)
+
+    def test_post_cards_cached(self):
+        """карточка поста берётся из кеша до изменения поста"""
+        post = Post.objects.create(author=self.user, text='Старый текст')
+        card = post_cards([post])[0]
+        Post.objects.filter(pk=post.pk).update(text='Текст без сигналов')
+        post.refresh_from_db()
+        self.assertEqual(post_cards([post])[0], card)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertIn('Новый текст', post_cards([post])[0])
 
     def test_follow(self):
         """Авторизованный пользователь может подписываться
@@ -264,6 +358,72 @@ class PostViewsTests(TestCase):
         ).context['page_obj']
         self.assertIn(post, response_auth)
 
+    def test_unfollow_prunes_timeline(self):
+        """после отписки посты автора пропадают из ленты подписчика"""
+        post = Post.objects.create(text='Тестовый пост', author=self.user_2)
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': self.user_2})
+        )
+        self.assertTrue(
+            Timeline.objects.filter(user=self.user, post=post).exists()
+        )
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.user_2})
+        )
+        self.assertFalse(Timeline.objects.filter(user=self.user).exists())
+
+    def test_following_from_cache(self):
+        """подписки проверяются по кешу, который меняется на месте"""
+        post = Post.objects.create(text='Тестовый пост', author=self.user_2)
+        index = reverse('posts:index')
+        self.assertContains(self.authorized_client.get(index), 'Подписаться')
+        self.assertEqual(list(follows.following_ids(self.user.pk)), [])
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': self.user_2})
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(
+                follows.followed_among(
+                    self.user.pk, {self.user.pk, post.author_id}
+                ),
+                {post.author_id},
+            )
+        self.assertEqual(len(queries), 0)
+        self.assertContains(
+            self.authorized_client.get(index), 'Вы подписаны'
+        )
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.user_2})
+        )
+        self.assertFalse(follows.is_following(self.user.pk, post.author_id))
+        self.assertNotContains(
+            self.authorized_client.get(index), 'Вы подписаны'
+        )
+
+    @mock.patch.object(timeline, 'FANOUT_LIMIT', 0)
+    def test_heavy_author_post_pulled_on_read(self):
+        """посты популярного автора попадают в ленту при её чтении"""
+        Follow.objects.create(user=self.user, author=self.user_2)
+        post = Post.objects.create(text='Тестовый пост', author=self.user_2)
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        url = reverse('posts:follow_index')
+        response = self.authorized_client.get(url)
+        self.assertIn(post, response.context['page_obj'])
+        # Без новых постов чтение ленты не пишет в БД и не привязывает
+        # пользователя к основной БД.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+        self.assertFalse([
+            query for query in queries
+            if query['sql'].startswith(('INSERT', 'UPDATE'))
+        ])
+        self.assertNotIn(db.WROTE_COOKIE, response.cookies)
+        newer = Post.objects.create(text='Новый пост', author=self.user_2)
+        response = self.authorized_client.get(url)
+        self.assertEqual(
+            list(response.context['page_obj'])[:2], [newer, post]
+        )
+
     def test_new_post_not_show(self):
         """Новая запись не появляется в ленте тех,
         кто не подписан
@@ -286,6 +446,7 @@ class PaginatorViewsTest(TestCase):
         cls.authorized_client = Client()
         cls.authorized_client.force_login(cls.user)
         cls.author_client = Client()
+        cls.follower = User.objects.create_user(username='follower')
         cls.group = Group.objects.create(
             title='Тестовая группа',
             slug='test_slug',
@@ -298,14 +459,21 @@ class PaginatorViewsTest(TestCase):
             text='Тестовый пост',
             group=cls.group) for id in range(cls.posts_count)
         ])
+        Follow.objects.create(user=cls.follower, author=cls.user)
         cls.paginator_context_names = {
             'index': '/',
             'group_list': f'/group/{cls.group.slug}/',
-            'profile': f'/profile/{cls.user}/'
+            'profile': f'/profile/{cls.user}/',
+            'follow_index': '/follow/',
         }
 
+    def setUp(self):
+        cache.clear()
+        # Лента подписок видна только подписчику.
+        self.client.force_login(self.follower)
+
     def test_paginator_correct_context(self):
-        """index, group_list, profile содержат 10 постов на первой странице"""
+        """ленты содержат 10 постов на первой странице"""
         for name, url in self.paginator_context_names.items():
             with self.subTest(name=name):
                 response = self.client.get(url)
@@ -313,9 +481,585 @@ class PaginatorViewsTest(TestCase):
                                  FULL_NUMBER_OF_POSTS)
 
     def test_paginator_correct_context_2(self):
-        """index, group_list, profile содержат 3 поста на второй странице"""
+        """ленты содержат 3 поста на второй странице"""
         for name, url in self.paginator_context_names.items():
             with self.subTest(name=name):
                 response = self.client.get(url + '?page=2')
                 self.assertEqual(len(response.context['page_obj']),
                                  REMAINING_POSTS)
+
+    def test_paginator_cursor(self):
+        """по курсорам ?after= и ?before= лента листается без номеров"""
+        paginator = CursorPaginator(Post.objects.all(), POST_COUNT)
+        first_page = list(paginator.object_list[:POST_COUNT])
+        after = paginator.cursor_for(first_page[-1])
+        for name, url in self.paginator_context_names.items():
+            with self.subTest(name=name):
+                response = self.client.get(url, {'after': after})
+                page_obj = response.context['page_obj']
+                self.assertIsInstance(page_obj, CursorPage)
+                self.assertEqual(len(page_obj), REMAINING_POSTS)
+                self.assertFalse(page_obj.has_next())
+                response = self.client.get(
+                    url, {'before': page_obj.previous_cursor}
+                )
+                self.assertEqual(
+                    list(response.context['page_obj']), first_page
+                )
+
+    def test_paginator_deep_page_redirects(self):
+        """номер страницы глубже SHALLOW_PAGES уводит на курсор"""
+        for name, url in self.paginator_context_names.items():
+            with self.subTest(name=name):
+                response = self.client.get(url, {'page': 5000})
+                self.assertEqual(
+                    len(response.context['page_obj']), REMAINING_POSTS
+                )
+        shallow_count = SHALLOW_PAGES * POST_COUNT
+        Post.objects.bulk_create([
+            Post(id=id, author=self.user, text='Тестовый пост',
+                 group=self.group)
+            for id in range(self.posts_count, shallow_count + 1)
+        ])
+        # bulk_create не шлёт сигналы: ни раскладки в ленту подписчика,
+        # ни новых версий лент.
+        timeline.backfill_timeline(self.follower.pk, self.user.pk)
+        cache.clear()
+        for name, url in self.paginator_context_names.items():
+            if name == 'follow_index':
+                paginator = CursorPaginator(
+                    self.follower.timeline.all(), POST_COUNT,
+                    keys=views.TIMELINE_KEYS,
+                )
+            else:
+                paginator = CursorPaginator(Post.objects.all(), POST_COUNT)
+            after = paginator.cursor_for(
+                paginator.object_list[shallow_count - 1]
+            )
+            with self.subTest(name=name):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, {'page': 5000})
+                self.assertRedirects(
+                    response, f'{url}?after={after}',
+                    fetch_redirect_response=False,
+                )
+                self.assertFalse([
+                    query for query in queries
+                    if 'COUNT(' in query['sql'].upper()
+                ])
+                response = self.client.get(response.url)
+                self.assertEqual(len(response.context['page_obj']), 1)
+
+    def test_paginator_count_bounded(self):
+        """подсчёт записей ограничен страницами с номерами"""
+        for name, url in self.paginator_context_names.items():
+            with self.subTest(name=name):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url)
+                counts = [
+                    query['sql'] for query in queries
+                    if 'COUNT(*)' in query['sql'].upper()
+                ]
+                self.assertEqual(len(counts), 1)
+                self.assertIn(
+                    f'LIMIT {SHALLOW_PAGES * POST_COUNT + 1}', counts[0]
+                )
+
+    def test_paginator_invalid_cursor(self):
+        """с испорченным курсором показывается первая страница"""
+        response = self.client.get('/', {'after': 'испорчен'})
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, text=f'Пост про котов номер {number}'
+            )
+            for number in range(POST_COUNT + 2)
+        ]
+        cls.group_post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Котов много не бывает'
+        )
+        cls.commented = Post.objects.create(author=cls.author, text='Пост')
+        Comment.objects.create(
+            post=cls.commented, author=cls.user, text='Тут нужны кошки'
+        )
+
+    def search(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        return response, response.context['posts']
+
+    def test_search_ranked_and_paginated(self):
+        """поиск отдаёт все найденные посты страницами по курсору"""
+        response, posts = self.search(q='котов')
+        self.assertEqual(len(posts), POST_COUNT)
+        self.assertIsNotNone(response.context['next_query'])
+        response = self.client.get(
+            reverse('posts:search') + '?' + response.context['next_query']
+        )
+        found = set(posts) | set(response.context['posts'])
+        self.assertEqual(found, set(self.posts) | {self.group_post})
+        self.assertIsNone(response.context['next_query'])
+
+    def test_search_filters(self):
+        """поиск фильтруется по группе и автору"""
+        _, posts = self.search(q='котов', group=self.group.slug)
+        self.assertEqual(posts, [self.group_post])
+        _, posts = self.search(q='котов', author=self.user.username)
+        self.assertNotIn(self.group_post, posts)
+
+    def test_search_index_follows_changes(self):
+        """индекс обновляется при изменении постов и комментариев"""
+        _, posts = self.search(q='кошки')
+        self.assertEqual(posts, [self.commented])
+        self.commented.comments.update(text='Тут нужны собаки')
+        _, posts = self.search(q='собаки')
+        self.assertEqual(posts, [self.commented])
+        self.commented.comments.all().delete()
+        _, posts = self.search(q='собаки')
+        self.assertEqual(posts, [])
+        self.group_post.text = 'Теперь про кошки'
+        self.group_post.save()
+        _, posts = self.search(q='кошки')
+        self.assertEqual(posts, [self.group_post])
+        call_command('rebuild_search_index', stdout=StringIO())
+        _, posts = self.search(q='кошки")')
+        self.assertEqual(posts, [self.group_post])
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.authors = [
+            User.objects.create_user(username=f'author_{number}')
+            for number in range(3)
+        ]
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+            for number in range(POST_COUNT):
+                post = Post.objects.create(
+                    author=author, group=cls.group, text=f'Пост {number}'
+                )
+                Comment.objects.create(
+                    post=post, author=cls.user, text='Комментарий'
+                )
+        cls.post = post
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_query_budgets(self):
+        """страницы укладываются в бюджет запросов и не делают N+1"""
+        author = self.post.author.username
+        budgets = (
+            (reverse('posts:index'), 6),
+            (reverse('posts:group_list', args=(self.group.slug,)), 6),
+            (reverse('posts:group_index'), 5),
+            (reverse('posts:profile', args=(author,)), 7),
+            # В тестах просмотр пишется в БД сразу, без буфера.
+            (reverse('posts:post_detail', args=(self.post.pk,)), 5),
+            (reverse('posts:post_create'), 3),
+            (reverse('posts:post_edit', args=(self.post.pk,)), 4),
+            (reverse('posts:follow_index'), 5),
+            (reverse('posts:search') + '?q=Пост', 5),
+            (reverse('posts:api_index'), 2),
+            (reverse('posts:api_group', args=(self.group.slug,)), 3),
+            (reverse('posts:api_profile', args=(author,)), 3),
+            (reverse('posts:api_post_detail', args=(self.post.pk,)), 3),
+            (reverse('posts:profile_unfollow', args=(author,)), 9),
+            (reverse('posts:profile_follow', args=(author,)), 12),
+        )
+        for url, budget in budgets:
+            with self.subTest(url=url):
+                self.assertQueryBudget(
+                    budget, self.authorized_client.get, url
+                )
+        self.assertQueryBudget(
+            6,
+            self.authorized_client.post,
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'Комментарий'},
+        )
+
+    def test_query_budget_export(self):
+        """выгрузка профиля читает записи пачками, а не по одной"""
+        client = Client()
+        client.force_login(self.post.author)
+        url = reverse('posts:profile_export', args=(self.post.author,))
+
+        def export(params):
+            response = client.get(url, params)
+            return b''.join(response.streaming_content)
+
+        for params, budget in (
+            ({}, 6),
+            ({'format': 'csv'}, 6),
+            ({'zip': 1}, 7),
+        ):
+            with self.subTest(params=params):
+                self.assertTrue(
+                    self.assertQueryBudget(budget, export, params)
+                )
+
+    def test_query_budgets_feeds(self):
+        """RSS и Atom укладываются в бюджет и берутся из кеша"""
+        author = self.post.author.username
+        for name, args, budget in (
+            ('posts:index_rss', (), 2),
+            ('posts:index_atom', (), 2),
+            ('posts:group_rss', (self.group.slug,), 3),
+            ('posts:group_atom', (self.group.slug,), 3),
+            ('posts:profile_rss', (author,), 3),
+            ('posts:profile_atom', (author,), 3),
+        ):
+            url = reverse(name, args=args)
+            with self.subTest(url=url):
+                self.assertQueryBudget(budget, self.client.get, url)
+                # Из кеша: только признак свежести ленты.
+                self.assertQueryBudget(1, self.client.get, url)
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+    def test_query_budgets_with_images(self):
+        """миниатюры картинок не добавляют запросов на страницу"""
+        self.addCleanup(shutil.rmtree, TEMP_MEDIA_ROOT, ignore_errors=True)
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        for number in range(3):
+            post = Post.objects.create(
+                author=self.post.author,
+                group=self.group,
+                text=f'Пост с картинкой {number}',
+                image=SimpleUploadedFile(
+                    f'budget_{number}.gif', small_gif, 'image/gif'
+                ),
+            )
+        cache.clear()
+        author = post.author.username
+        budgets = (
+            (reverse('posts:index'), 6),
+            (reverse('posts:group_list', args=(self.group.slug,)), 6),
+            (reverse('posts:profile', args=(author,)), 7),
+            (reverse('posts:post_detail', args=(post.pk,)), 5),
+        )
+        for url, budget in budgets:
+            with self.subTest(url=url):
+                response = self.assertQueryBudget(
+                    budget, self.authorized_client.get, url
+                )
+        self.assertContains(response, 'srcset=')
+
+    @override_settings(QUERY_BUDGET_ENABLED=True)
+    def test_query_stats_middleware(self):
+        """middleware копит число запросов по имени view"""
+        reset_view_stats()
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            view_stats()['posts:index']['queries'],
+            int(response['X-Query-Count']),
+        )
+
+    def test_nplusone_detected(self):
+        """повторяющиеся запросы находятся вместе с местом в коде"""
+        with QueryRecorder() as recorder:
+            authors = [
+                comment.author.username
+                for comment in Comment.objects.all()
+            ]
+        self.assertTrue(authors)
+        repeated = recorder.repeated()
+        self.assertEqual(len(repeated), 1)
+        [(count, locations)] = repeated.values()
+        self.assertEqual(count, len(authors))
+        self.assertIn('posts/tests/test_views.py', locations[0])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.other = User.objects.create_user(username='other')
+        cls.small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            image=SimpleUploadedFile(
+                'export.gif', cls.small_gif, 'image/gif'
+            ),
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Тестовый комментарий'
+        )
+        Follow.objects.create(user=cls.user, author=cls.other)
+        cls.url = reverse('posts:profile_export', args=(cls.user.username,))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_export_only_for_author(self):
+        """выгрузка доступна только самому автору"""
+        client = Client()
+        client.force_login(self.other)
+        self.assertRedirects(
+            client.get(self.url),
+            reverse('posts:profile', args=(self.user.username,)),
+        )
+
+    def test_export_streams_records(self):
+        """выгрузка отдаётся потоком в jsonl и csv"""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(self.url)
+        self.assertTrue(response.streaming)
+        records = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [record['type'] for record in records],
+            ['post', 'comment', 'follow'],
+        )
+        response = client.get(self.url, {'format': 'csv'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 4)
+
+    def test_export_zip_with_media(self):
+        """в zip-архив попадают записи и картинки"""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(self.url, {'zip': 1})
+        archive = zipfile.ZipFile(
+            BytesIO(b''.join(response.streaming_content))
+        )
+        self.assertEqual(
+            archive.namelist(),
+            ['content.jsonl', f'media/{self.post.image.name}'],
+        )
+        self.assertEqual(
+            archive.read(f'media/{self.post.image.name}'), self.small_gif
+        )
+
+
+class FeedViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Пост в группе'
+        )
+        cls.other_post = Post.objects.create(
+            author=User.objects.create_user(username='other'),
+            text='Пост без группы',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_show_posts(self):
+        """RSS и Atom отдают посты своей ленты"""
+        feeds = {
+            'posts:index_rss': ({}, 2),
+            'posts:index_atom': ({}, 2),
+            'posts:group_rss': ({'slug': self.group.slug}, 1),
+            'posts:group_atom': ({'slug': self.group.slug}, 1),
+            'posts:profile_rss': ({'username': self.user.username}, 1),
+            'posts:profile_atom': ({'username': self.user.username}, 1),
+        }
+        for name, (kwargs, count) in feeds.items():
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, kwargs=kwargs))
+                self.assertEqual(response.status_code, 200)
+                content = response.content.decode()
+                tag = '<entry>' if name.endswith('atom') else '<item>'
+                self.assertEqual(content.count(tag), count)
+                self.assertIn(self.post.text, content)
+
+    def test_feed_cached_until_new_post(self):
+        """лента берётся из кеша и обновляется с новым постом"""
+        url = reverse('posts:group_rss', kwargs={'slug': self.group.slug})
+        response = self.client.get(url)
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        ).status_code, 304)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        # Только признак свежести: последний пост ленты.
+        self.assertEqual(len(queries), 1)
+        Post.objects.create(
+            author=self.user, group=self.group, text='Новый пост в группе'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Новый пост в группе', response.content.decode())
+        self.assertEqual(self.client.get(
+            reverse('posts:group_rss', kwargs={'slug': 'missing'})
+        ).status_code, 404)
+
+
+class PageViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            author=User.objects.create_user(username='HasNoName'),
+            text='Тестовый пост',
+        )
+        cls.url = reverse('posts:post_detail', args=(cls.post.pk,))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_view_counted(self):
+        """просмотр поста увеличивает счётчик"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['post'].views, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 1)
+
+    def test_views_outside_card_cache(self):
+        """просмотры не меняют ключ кеша карточки"""
+        key = card_key(self.post)
+        self.client.get(self.url)
+        self.post.refresh_from_db()
+        self.assertEqual(card_key(self.post), key)
+        self.assertIn('Просмотров: 1', post_cards([self.post])[0])
+
+    def test_views_refresh_feeds(self):
+        """записанные просмотры обновляют кеш и ETag лент и API"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:api_index'),
+            reverse('posts:api_post_detail', args=(self.post.pk,)),
+        )
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        # Версия просмотров меняется не чаще раза в интервал.
+        self.client.get(self.url)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 304)
+        with mock.patch.object(versions, 'VIEWS_STAMP_INTERVAL', 0):
+            self.client.get(self.url)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(
+                    'Просмотров: 2' if url == urls[0] else '"views": 2',
+                    response.content.decode(),
+                )
+
+    @override_settings(VIEWS_BUFFERED=True)
+    @mock.patch.object(pageviews, 'VIEWS_FLUSH_HITS', 3)
+    def test_views_buffered(self):
+        """просмотры копятся в памяти и пишутся одним запросом"""
+        self.addCleanup(pageviews.flush)
+        pageviews.flush()
+        flushes = pageviews.flush_stats()['flushes']
+        missing = reverse('posts:post_detail', args=(self.post.pk + 100,))
+        self.assertEqual(self.client.get(missing).status_code, 404)
+        self.assertEqual(pageviews.pending(self.post.pk + 100), 0)
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['post'].views, 2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 0)
+        with CaptureQueriesContext(connection) as queries:
+            pageviews.record_view(self.post.pk)
+        self.assertEqual(len(queries), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 3)
+        self.assertEqual(pageviews.pending(self.post.pk), 0)
+        self.assertEqual(pageviews.flush_stats()['flushes'], flushes + 1)
+
+
+class GroupIndexViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.other = User.objects.create_user(username='other')
+        cls.big = Group.objects.create(
+            title='Большая', slug='big', description='Описание'
+        )
+        cls.small = Group.objects.create(
+            title='Маленькая', slug='small', description='Описание'
+        )
+        cls.empty = Group.objects.create(
+            title='Пустая', slug='empty', description='Описание'
+        )
+        for author in (cls.user, cls.other, cls.user):
+            Post.objects.create(author=author, group=cls.big, text='Пост')
+        cls.latest = Post.objects.create(
+            author=cls.user, group=cls.small, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_groups_with_stats(self):
+        """каталог групп упорядочен по числу постов и показывает сводку"""
+        response = self.client.get(reverse('posts:group_index'))
+        groups = list(response.context['page_obj'])
+        self.assertEqual(groups, [self.big, self.small, self.empty])
+        self.assertEqual(
+            [(group.posts_count, group.active_authors) for group in groups],
+            [(3, 2), (1, 1), (0, 0)],
+        )
+        self.assertEqual(groups[1].latest_post, self.latest.pub_date)
+        self.assertIsNone(groups[2].latest_post)
+
+    @mock.patch.object(views, 'GROUP_COUNT', 2)
+    def test_groups_cursor_and_cache(self):
+        """каталог листается курсором и обновляется с новым постом"""
+        url = reverse('posts:group_index')
+        page = self.client.get(url).context['page_obj']
+        self.assertEqual(list(page), [self.big, self.small])
+        response = self.client.get(url, {'after': page.next_cursor})
+        self.assertEqual(list(response.context['page_obj']), [self.empty])
+        self.assertIsNone(self.client.get(url).context)
+        Post.objects.create(author=self.user, group=self.empty, text='Пост')
+        page = self.client.get(url).context['page_obj']
+        self.assertEqual(page[1].posts_count, 1)
@@ -0,0 +1,143 @@
+"""Материализованная лента подписок (fan-out-on-write).
+
+Новый пост раскладывается в ленты подписчиков фоновой задачей.
+У авторов с очень большим числом подписчиков раскладки при записи нет:
+подписчик сам подтягивает их свежие посты в свою ленту при чтении.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+
+from . import follows
+from .models import Follow, Post, Timeline, UserCounter
+
+# Сколько последних постов автора попадает в ленту при подписке.
+TIMELINE_BACKFILL = 100
+# Авторы, у которых подписчиков больше, раскладываются при чтении.
+FANOUT_LIMIT = 10000
+FANOUT_BATCH = 1000
+HEAVY_AUTHORS_KEY = 'timeline:heavy_authors'
+HEAVY_AUTHORS_CACHE_TIME = 60 * 5
+PULLED_KEY = 'timeline:pulled_mark:{}'
+# Запас на посты, зафиксированные в БД позже своей pub_date.
+PULL_OVERLAP = timedelta(minutes=1)
+
+
+def heavy_author_ids():
+    author_ids = cache.get(HEAVY_AUTHORS_KEY)
+    if author_ids is None:
+        author_ids = set(UserCounter.objects.filter(
+            followers_count__gt=FANOUT_LIMIT
+        ).values_list('user_id', flat=True))
+        cache.set(HEAVY_AUTHORS_KEY, author_ids, HEAVY_AUTHORS_CACHE_TIME)
+    return author_ids
+
+
+def _entries(user_id, posts):
+    return [
+        Timeline(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for post in posts
+    ]
+
+
+def fanout_post(post_id):
+    """Раскладывает пост в ленты всех подписчиков автора."""
+    post = Post.objects.filter(pk=post_id).only(
+        'pk', 'author_id', 'pub_date'
+    ).first()
+    if post is None or post.author_id in heavy_author_ids():
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    batch = []
+    for user_id in followers.iterator(chunk_size=FANOUT_BATCH):
+        batch.extend(_entries(user_id, [post]))
+        if len(batch) >= FANOUT_BATCH:
+            Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _latest_posts(author_id):
+    return list(Post.objects.filter(author_id=author_id).only(
+        'pk', 'author_id', 'pub_date'
+    ).order_by('-pub_date', '-pk')[:TIMELINE_BACKFILL])
+
+
+def backfill_timeline(user_id, author_id):
+    """Добавляет в ленту подписчика последние посты автора."""
+    Timeline.objects.bulk_create(
+        _entries(user_id, _latest_posts(author_id)), ignore_conflicts=True
+    )
+
+
+def backfill_timelines(pairs):
+    """``backfill_timeline`` для многих пар (подписчик, автор) сразу.
+
+    Посты каждого автора читаются один раз, записи вставляются
+    пачками по ``FANOUT_BATCH``.
+    """
+    followers = defaultdict(list)
+    for user_id, author_id in pairs:
+        followers[author_id].append(user_id)
+    batch = []
+    for author_id, user_ids in followers.items():
+        posts = _latest_posts(author_id)
+        for user_id in user_ids:
+            batch.extend(_entries(user_id, posts))
+            if len(batch) >= FANOUT_BATCH:
+                Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+    Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def prune_timeline(user_id, author_id):
+    """Убирает из ленты подписчика посты автора."""
+    Timeline.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def pull_heavy_posts(user_id):
+    """Подтягивает в ленту свежие посты популярных авторов.
+
+    Их посты не раскладываются при записи, поэтому подписчик забирает
+    их сам перед чтением ленты. В кеше хранится отметка: дата самого
+    нового забранного поста и id постов за последние ``PULL_OVERLAP``.
+    Без новых постов чтение ленты ничего не пишет.
+    """
+    heavy = heavy_author_ids()
+    if not heavy:
+        return
+    author_ids = follows.followed_among(user_id, heavy)
+    if not author_ids:
+        return
+    key = PULLED_KEY.format(user_id)
+    state = cache.get(key)
+    posts = Post.objects.filter(author_id__in=author_ids).only(
+        'pk', 'author_id', 'pub_date'
+    ).order_by('-pub_date', '-pk')
+    recent = {}
+    if state is not None:
+        since, recent = state
+        posts = posts.filter(
+            pub_date__gt=since - PULL_OVERLAP
+        ).exclude(pk__in=recent)
+    posts = list(posts[:TIMELINE_BACKFILL])
+    if not posts:
+        return
+    Timeline.objects.bulk_create(
+        _entries(user_id, posts), ignore_conflicts=True
+    )
+    recent = {**recent, **{post.pk: post.pub_date for post in posts}}
+    since = max(recent.values())
+    recent = {
+        pk: pub_date for pk, pub_date in recent.items()
+        if pub_date > since - PULL_OVERLAP
+    }
+    cache.set(key, (since, recent), None)
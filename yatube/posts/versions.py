@@ -0,0 +1,171 @@
+"""Версии лент для кеширования страниц.
+
+У каждой ленты (главная, группа, автор) есть ключ версии в кеше.
+Изменение данных ленты меняет её версию, и страницы, закешированные
+со старой версией, больше не читаются - новые записи видны сразу.
+"""
+import hashlib
+import time
+from datetime import datetime
+from functools import wraps
+
+from django.core.cache import cache
+from django.utils import timezone
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+
+FEED_CACHE_TIME = 60 * 60 * 4
+VERSION_KEY = 'feed:version:{}'
+PAGE_KEY = 'feed:page:{}'
+INDEX = 'index'
+# Каталог групп: число постов, последний пост и активные авторы.
+GROUPS = 'groups'
+# Просмотры постов: версия меняется при записи просмотров, но не чаще
+# раза в VIEWS_STAMP_INTERVAL секунд, поэтому счётчики в кеше страниц
+# и за ETag отстают не больше чем на этот интервал.
+VIEWS = 'views'
+VIEWS_STAMP_INTERVAL = 60
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def following_scope(user_id):
+    """Подписки пользователя: от них зависят кнопки подписки в лентах."""
+    return f'following:{user_id}'
+
+
+def user_scopes(request):
+    if request.user.is_authenticated:
+        return [following_scope(request.user.pk)]
+    return []
+
+
+def post_scopes(post):
+    """Ленты, в которых показан пост."""
+    scopes = [INDEX, author_scope(post.author.username)]
+    if post.group_id is not None:
+        scopes.append(group_scope(post.group.slug))
+    return scopes
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def get_versions(*scopes):
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    """Меняет версии лент: их закешированные страницы устаревают."""
+    scopes = {scope for scope in scopes if scope}
+    if scopes:
+        version = _new_version()
+        cache.set_many(
+            {VERSION_KEY.format(scope): version for scope in scopes}, None
+        )
+
+
+def bump_views():
+    """Меняет версию просмотров, если она старше интервала."""
+    [version] = get_versions(VIEWS)
+    if time.time_ns() - version >= VIEWS_STAMP_INTERVAL * 10 ** 9:
+        bump(VIEWS)
+
+
+def feed_state(posts, *scopes):
+    """Дешёвый признак свежести ленты без загрузки постов.
+
+    Последний пост (pub_date, id) читается по индексу, версии лент
+    меняются при правках и удалениях.
+    """
+    latest = posts.order_by('-pub_date', '-pk').values_list(
+        'pub_date', 'pk'
+    ).first()
+    return latest, get_versions(*scopes)
+
+
+def cache_feed(get_scopes, timeout=FEED_CACHE_TIME):
+    """Кеширует страницу ленты, пока не сменится версия её лент.
+
+    ``get_scopes`` получает аргументы view и возвращает ленты,
+    из которых собрана страница. Ключ учитывает пользователя:
+    шапка и кнопки подписки у каждого свои, а версия его подписок
+    добавляется к версиям лент.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            versions = get_versions(
+                *get_scopes(*args, **kwargs), *user_scopes(request)
+            )
+            source = '|'.join(map(str, (
+                request.get_full_path(), request.user.pk, *versions
+            )))
+            key = PAGE_KEY.format(hashlib.md5(source.encode()).hexdigest())
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(key, response, timeout)
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_feed(get_scopes, get_posts):
+    """Отвечает 304 на If-None-Match и If-Modified-Since для ленты.
+
+    Свежесть считается до построения страницы по ``feed_state``:
+    ``get_posts`` получает аргументы view и возвращает queryset ленты.
+    В шапке страницы имя пользователя, поэтому ETag учитывает его,
+    а Last-Modified, одинаковый для всех, отдаётся только анонимам.
+    """
+    def state(request, *args, **kwargs):
+        if not hasattr(request, '_feed_state'):
+            request._feed_state = feed_state(
+                get_posts(*args, **kwargs),
+                *get_scopes(*args, **kwargs),
+                *user_scopes(request),
+            )
+        return request._feed_state
+
+    def etag(request, *args, **kwargs):
+        latest, versions = state(request, *args, **kwargs)
+        source = '|'.join(map(str, (
+            request.get_full_path(), request.user.pk, latest, *versions
+        )))
+        return hashlib.md5(source.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        latest, versions = state(request, *args, **kwargs)
+        # Версия - время изменения ленты в наносекундах.
+        stamps = [
+            datetime.fromtimestamp(version / 10 ** 9, timezone.utc)
+            for version in versions
+        ]
+        if latest is not None:
+            stamps.append(latest[0])
+        return max(stamps)
+
+    def decorator(view):
+        return vary_on_cookie(
+            condition(etag_func=etag, last_modified_func=last_modified)(view)
+        )
+    return decorator
@@ -1,35 +1,75 @@
+from datetime import timedelta
+
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.files.storage import default_storage
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.utils import timezone
 
-from .forms import CommentForm, PostForm
+from . import exporter, follows, pageviews, search, timeline
+from .forms import CommentForm, PostForm, SearchForm
 from .models import Follow, Group, Post, User
+from .paginators import CURSOR_KEYS, SHALLOW_PAGES, CursorPaginator
+from .versions import (GROUPS, INDEX, VIEWS, author_scope, cache_feed,
+                       conditional_feed, group_scope)
 
 POST_COUNT = 10
-CACHE_TIME = 20
+COMMENT_COUNT = 20
+TIMELINE_KEYS = ('pub_date', 'post_id')
+GROUP_COUNT = 20
+GROUP_KEYS = ('posts_count', 'pk')
+# За сколько дней считаются активные авторы группы.
+ACTIVE_AUTHORS_DAYS = 30
 
 
-def paginate_page(request, posts):
-    paginator = Paginator(posts, POST_COUNT)
+def paginate_page(request, posts, keys=CURSOR_KEYS):
+    """Страница ленты или редирект с глубокого номера на курсор."""
+    paginator = CursorPaginator(posts, POST_COUNT, keys=keys)
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after or before:
+        return paginator.get_cursor_page(after=after, before=before)
     page_number = request.GET.get('page')
+    if page_number and page_number.isdigit() and (
+        int(page_number) > SHALLOW_PAGES
+    ):
+        # Без COUNT(*) и глубокого OFFSET: дальше страниц с номерами
+        # лента листается курсором.
+        after = paginator.shallow_end_cursor()
+        if after is not None:
+            params = request.GET.copy()
+            del params['page']
+            params['after'] = after
+            return redirect(f'{request.path}?{params.urlencode()}')
     return paginator.get_page(page_number)
 
 
-@cache_page(CACHE_TIME, key_prefix='index_page')
+@conditional_feed(lambda: [INDEX, VIEWS], lambda: Post.objects.all())
+@cache_feed(lambda: [INDEX, VIEWS])
 def index(request):
     posts = Post.objects.select_related('author', 'group')
     page_obj = paginate_page(request=request, posts=posts)
+    if isinstance(page_obj, HttpResponse):
+        return page_obj
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional_feed(
+    lambda slug: [group_scope(slug), VIEWS],
+    lambda slug: Post.objects.filter(group__slug=slug),
+)
+@cache_feed(lambda slug: [group_scope(slug), VIEWS])
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.select_related('author', 'group')
     page_obj = paginate_page(request=request, posts=posts)
+    if isinstance(page_obj, HttpResponse):
+        return page_obj
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -38,28 +78,106 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+def annotate_groups(groups):
+    """Последний пост и активные авторы: подзапросы по индексу постов."""
+    posts = Post.objects.filter(group=OuterRef('pk')).order_by()
+    since = timezone.now() - timedelta(days=ACTIVE_AUTHORS_DAYS)
+    return groups.annotate(
+        latest_post=Subquery(
+            posts.order_by('-pub_date').values('pub_date')[:1]
+        ),
+        active_authors=Coalesce(Subquery(
+            posts.filter(pub_date__gte=since)
+            .values('group')
+            .annotate(total=Count('author', distinct=True))
+            .values('total'),
+            output_field=IntegerField(),
+        ), 0),
+    )
+
+
+@conditional_feed(
+    lambda: [GROUPS], lambda: Post.objects.filter(group__isnull=False)
+)
+@cache_feed(lambda: [GROUPS])
+def group_index(request):
+    paginator = CursorPaginator(
+        annotate_groups(Group.objects.all()), GROUP_COUNT, keys=GROUP_KEYS
+    )
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after or before:
+        page_obj = paginator.get_cursor_page(after=after, before=before)
+    else:
+        page_obj = paginator.first_page()
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/group_index.html', context)
+
+
+@conditional_feed(
+    lambda username: [author_scope(username), VIEWS],
+    lambda username: Post.objects.filter(author__username=username),
+)
+@cache_feed(lambda username: [author_scope(username), VIEWS])
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
     posts = author.posts.select_related('author', 'group')
     page_obj = paginate_page(request=request, posts=posts)
-    following = (
-        request.user.is_authenticated
-        and Follow.objects.filter(
-            user=request.user, author=author
-        ).exists()
-    )
+    if isinstance(page_obj, HttpResponse):
+        return page_obj
+    following = follows.is_following(request.user.pk, author.pk)
     context = {
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        'counters': getattr(author, 'counters', None),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def search_posts(request):
+    form = SearchForm(request.GET or None)
+    posts, next_query = [], None
+    if form.is_valid() and form.cleaned_data['q']:
+        posts, next_cursor = search.search_posts(
+            form.cleaned_data['q'],
+            POST_COUNT,
+            group=form.cleaned_data['group'],
+            author=form.cleaned_data['author'],
+            after=request.GET.get('after'),
+        )
+        if next_cursor:
+            params = request.GET.copy()
+            params['after'] = next_cursor
+            next_query = params.urlencode()
+    context = {
+        'form': form,
+        'posts': posts,
+        'next_query': next_query,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        pk=post_id
+    )
+    # Просмотры не видны в только что прочитанной строке.
+    post.views += pageviews.record_view(post.pk)
     form = CommentForm()
-    comments = post.comments.all()
+    paginator = CursorPaginator(
+        post.comments.select_related('author'), COMMENT_COUNT
+    )
+    after = request.GET.get('after')
+    if after:
+        comments = paginator.get_cursor_page(after=after)
+    else:
+        comments = paginator.first_page()
     context = {
         'post': post,
         'form': form,
@@ -70,7 +188,7 @@ def post_detail(request, post_id):
 
 @login_required
 def post_create(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if request.method == 'POST' and form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
@@ -117,8 +235,16 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginate_page(request=request, posts=posts)
+    timeline.pull_heavy_posts(request.user.pk)
+    entries = request.user.timeline.select_related(
+        'post__author', 'post__group'
+    )
+    page_obj = paginate_page(
+        request=request, posts=entries, keys=TIMELINE_KEYS
+    )
+    if isinstance(page_obj, HttpResponse):
+        return page_obj
+    page_obj.object_list = [entry.post for entry in page_obj]
     context = {
         'page_obj': page_obj,
     }
@@ -138,3 +264,26 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', author.username)
+
+
+@login_required
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        return redirect('posts:profile', username)
+    file_format = request.GET.get('format', 'jsonl')
+    if file_format not in ('jsonl', 'csv'):
+        raise Http404
+    if request.GET.get('zip'):
+        content = exporter.stream_zip(author, default_storage, file_format)
+        extension = 'zip'
+    else:
+        content = exporter.stream_export(author, file_format)
+        extension = file_format
+    response = StreamingHttpResponse(
+        content, content_type=exporter.CONTENT_TYPES[extension]
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{author.username}.{extension}"'
+    )
+    return response
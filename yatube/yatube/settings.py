@@ -44,11 +44,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'posts',
+    'posts.apps.PostsConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.queries.QueryBudgetMiddleware',
+    'core.profiling.TemplateProfilerMiddleware',
+    'core.db.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,9 +92,46 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт между запросами, а не открывается на каждый.
+        'CONN_MAX_AGE': 600,
     }
 }
 
+# Ставятся каждому новому соединению с SQLite (core.db). В режиме WAL
+# читатели не ждут писателя, а писатели ждут друг друга до busy_timeout
+# миллисекунд вместо ошибки database is locked.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение - размер в КиБ.
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+# Реплика для чтения (core.db). Локально её заменяет копия SQLite-файла,
+# которую обновляет команда sync_replica.
+REPLICA_PATH = os.environ.get('YATUBE_REPLICA')
+if REPLICA_PATH:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': REPLICA_PATH,
+        'CONN_MAX_AGE': 600,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+# С реплик читают только страницы этих приложений.
+REPLICA_NAMESPACES = ('posts', 'users')
+# GET-view, которые пишут в БД: читают с основной.
+REPLICA_PRIMARY_VIEWS = ('posts:profile_follow', 'posts:profile_unfollow')
+# Реплика старше этого не читается. Записавший пользователь читает
+# только реплики, снятые после его записи.
+REPLICA_MAX_LAG = 60
+REPLICA_RETRY_SECONDS = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -140,14 +180,57 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# В бою collectstatic пишет имена с хешем и сжатые копии (core.static).
+STATICFILES_STORAGE = (
+    'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+    else 'core.static.CompressedManifestStorage'
+)
+# Сколько кешировать статику без хеша в имени.
+STATIC_MAX_AGE = 60 * 60
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Картинки и миниатюры отдаёт core.media; имена файлов не повторяются,
+# а после срока браузер сверяет ETag.
+MEDIA_MAX_AGE = 60 * 60 * 24 * 7
+# За nginx: internal-location с MEDIA_ROOT, например '/protected-media/'.
+# Тогда файлы отдаёт nginx по X-Accel-Redirect.
+MEDIA_ACCEL_REDIRECT = os.environ.get('YATUBE_MEDIA_ACCEL', '')
+
+# Загрузки сразу пишутся во временный файл, а не держатся в памяти.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
 
+# L1 в памяти процесса + общий L2 на диске, согласованные между воркерами.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': os.path.join(BASE_DIR, '.cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 30,
+        },
     }
 }
+
+# Тесты работают с кешем во временном каталоге (core.runner).
+TEST_RUNNER = 'core.runner.TempCacheRunner'
+
+# Учёт SQL-запросов по view и поиск N+1 (core.queries).
+QUERY_BUDGET_ENABLED = DEBUG
+
+# Замеры отрисовки шаблонов по запросам (core.profiling), включаются
+# на время поиска медленных шаблонов.
+TEMPLATE_PROFILING_ENABLED = False
+
+# Фоновые задачи (core.tasks): в режиме отладки выполняются сразу.
+TASKS_ASYNC = not DEBUG
+TASKS_WORKERS = 2
+
+# Просмотры постов копятся в памяти и пишутся пачкой (posts.pageviews).
+VIEWS_BUFFERED = not DEBUG